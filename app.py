@@ -3,32 +3,603 @@ ScrapeBI - No-Code Web Scraping Tool
 A complete web scraping solution with visual element selector
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+from cssselect import HTMLTranslator, SelectorError
+import asyncio
+import copy
+import csv
+import gzip
+import hashlib
+import io
 import json
+import math
+import multiprocessing
 import os
+import queue
 import re
+import shutil
 import time
 import uuid
 import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
-from urllib.parse import urlparse
-import pandas as pd
+from html import unescape
+from urllib.parse import urldefrag, urljoin, urlparse
+import requests
+from requests.adapters import HTTPAdapter
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'scrapebi-secret-key'
 
-# Global storage for scraped data
-scraped_data_store = {}
+# Global storage for scraped data (scraped_data_store is a PageStore, created below)
 extraction_rules_store = {}
+# Saved rules compiled once at save time, keyed by rule ID
+compiled_rules_store = {}
+
+# WebDriver pool settings
+POOL_SIZE = int(os.getenv('SCRAPEBI_POOL_SIZE', 2))
+POOL_MAX_PAGES = int(os.getenv('SCRAPEBI_POOL_MAX_PAGES', 100))
+POOL_MAX_IDLE = int(os.getenv('SCRAPEBI_POOL_MAX_IDLE', 600))
+POOL_CHECKOUT_TIMEOUT = int(os.getenv('SCRAPEBI_POOL_TIMEOUT', 60))
+CHROME_HEADLESS = os.getenv('CHROME_HEADLESS', 'False').lower() in ('1', 'true', 'yes')
+
+# ChromeDriver binary settings
+CHROMEDRIVER_PATH = os.getenv('SCRAPEBI_CHROMEDRIVER', '')
+CHROMEDRIVER_CACHE_FILE = os.getenv(
+    'SCRAPEBI_CHROMEDRIVER_CACHE', os.path.join(tempfile.gettempdir(), 'scrapebi_chromedriver.json')
+)
+# Offline mode never asks webdriver-manager to resolve or download a driver
+OFFLINE = os.getenv('SCRAPEBI_OFFLINE', 'False').lower() in ('1', 'true', 'yes')
+
+# Parsed document cache settings
+DOM_CACHE_MB = int(os.getenv('SCRAPEBI_DOM_CACHE_MB', 256))
+DOM_CACHE_MAX_ENTRIES = int(os.getenv('SCRAPEBI_DOM_CACHE_ENTRIES', 64))
+# A parsed tree takes several times the memory of its source HTML
+DOM_COST_FACTOR = 8
+
+# Visual-selector preview documents; bump PREVIEW_VERSION when the injected markup changes
+PREVIEW_VERSION = 1
+# Elements removed from previews: anything that runs code, embeds other documents or navigates
+PREVIEW_DROP_TAGS = {'script', 'iframe', 'frame', 'frameset', 'object', 'embed', 'applet', 'base', 'portal'}
+PREVIEW_URL_ATTRIBUTES = ('href', 'src', 'action', 'formaction', 'xlink:href')
+# Highlighting is done with one stylesheet and a few listeners on the root, however big the page
+PREVIEW_STYLE = """
+[data-sbi-hover] { outline: 2px solid #3b82f6 !important; cursor: pointer !important; }
+[data-sbi-selected] { outline: 3px solid #10b981 !important; }
+"""
+PREVIEW_SCRIPT = """
+(function () {
+    var root = document.documentElement, hovered = null, selected = null;
+    function target(e) {
+        return e.target && e.target.closest ? e.target.closest('[data-sbi-id]') : null;
+    }
+    root.addEventListener('mouseover', function (e) {
+        var el = target(e);
+        if (el === hovered) return;
+        if (hovered) hovered.removeAttribute('data-sbi-hover');
+        hovered = el;
+        if (el) el.setAttribute('data-sbi-hover', '');
+    });
+    root.addEventListener('mouseleave', function () {
+        if (hovered) hovered.removeAttribute('data-sbi-hover');
+        hovered = null;
+    });
+    root.addEventListener('click', function (e) {
+        var el = target(e);
+        e.preventDefault();
+        e.stopPropagation();
+        if (!el) return;
+        if (selected) selected.removeAttribute('data-sbi-selected');
+        selected = el;
+        el.setAttribute('data-sbi-selected', '');
+        window.parent.postMessage({
+            type: 'element_selected',
+            sbi_id: Number(el.getAttribute('data-sbi-id')),
+            tag: el.tagName,
+            id: el.id,
+            className: el.getAttribute('class') || '',
+            text: (el.textContent || '').trim().substring(0, 100)
+        }, '*');
+    }, true);
+    // Forms would otherwise navigate the preview away from the page
+    root.addEventListener('submit', function (e) { e.preventDefault(); }, true);
+})();
+"""
+
+def build_preview(tree, positions, url):
+    """Copy a page tree without scripts or embeds, tag each element with data-sbi-id and add the selector script"""
+    preview = copy.deepcopy(tree)
+    ids = iter(range(len(positions.elements)))
+    base = None
+    dropped = []
+    for original, node in zip(tree.iter(), preview.iter()):
+        if not isinstance(original.tag, str):
+            continue
+        node.set('data-sbi-id', str(next(ids)))
+        tag = node.tag
+        if tag == 'base' and base is None and node.get('href'):
+            base = node.get('href')
+        if tag in PREVIEW_DROP_TAGS or (tag == 'meta' and node.get('http-equiv', '').lower() == 'refresh'):
+            dropped.append(node)
+            continue
+        for name, value in list(node.attrib.items()):
+            if name.startswith('on'):
+                del node.attrib[name]
+            elif name in PREVIEW_URL_ATTRIBUTES and value.strip().lower().startswith('javascript:'):
+                node.set(name, '#')
+    for node in dropped:
+        if node.getparent() is not None:
+            node.drop_tree()
+
+    head = preview.find('head')
+    if head is None:
+        head = etree.Element('head')
+        preview.insert(0, head)
+    injected = [
+        etree.Element('base', href=urljoin(url, base) if base else url),
+        etree.Element('style'),
+        etree.Element('script')
+    ]
+    injected[1].text = PREVIEW_STYLE
+    injected[2].text = PREVIEW_SCRIPT
+    for position, element in enumerate(injected):
+        head.insert(position, element)
+
+    doctype = tree.getroottree().docinfo.doctype or '<!DOCTYPE html>'
+    return lxml.html.tostring(preview, doctype=doctype, encoding='utf-8', method='html')
+
+class ParsedDocument:
+    """One page's HTML with a lazily built lxml tree and element indexes"""
+
+    # Live documents by id() of their root element, so code holding only a tree can reach its indexes
+    _owners = weakref.WeakValueDictionary()
+
+    def __init__(self, html):
+        self.html = html
+        self._tree = None
+        self._inventory = None
+        self._positions = None
+        self._previews = {}
+
+    @classmethod
+    def owner(cls, root):
+        """The ParsedDocument whose tree is `root`, or None"""
+        document = cls._owners.get(id(root))
+        return document if document is not None and document._tree is root else None
+
+    @property
+    def tree(self):
+        """lxml root element of the page"""
+        if self._tree is None:
+            try:
+                # Parse bytes so pages with an XML encoding declaration are accepted
+                self._tree = lxml.html.document_fromstring(
+                    self.html.encode('utf-8'), parser=lxml.html.HTMLParser(encoding='utf-8')
+                )
+            except etree.ParserError:
+                self._tree = lxml.html.document_fromstring('<html></html>')
+            ParsedDocument._owners[id(self._tree)] = self
+        return self._tree
+
+    @property
+    def inventory(self):
+        """ElementInventory for the visual selector, built on first use"""
+        if self._inventory is None:
+            self._inventory = ElementInventory(self.tree)
+        return self._inventory
+
+    @property
+    def positions(self):
+        """PositionIndex giving XPaths and unique selectors, built on first use"""
+        if self._positions is None:
+            self._positions = PositionIndex(self.tree)
+        return self._positions
+
+    def preview(self, url):
+        """Sanitized visual-selector document for this page as UTF-8 bytes, built once per base URL.
+
+        Every element of the copy carries data-sbi-id, its position in PositionIndex.elements, so a
+        click in the preview maps back to the node in this document's tree.
+        """
+        if url not in self._previews:
+            self._previews[url] = build_preview(self.tree, self.positions, url)
+        return self._previews[url]
+
+# Page store settings
+PAGE_STORE_MEMORY_MB = int(os.getenv('SCRAPEBI_STORE_MEMORY_MB', 256))
+PAGE_STORE_DISK_MB = int(os.getenv('SCRAPEBI_STORE_DISK_MB', 2048))
+PAGE_STORE_TTL = int(os.getenv('SCRAPEBI_STORE_TTL', 24 * 3600))
+PAGE_STORE_DIR = os.getenv('SCRAPEBI_STORE_DIR', os.path.join(tempfile.gettempdir(), 'scrapebi_pages'))
+PAGE_STORE_CODEC = os.getenv('SCRAPEBI_STORE_CODEC', 'zstd')
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Fetch mode settings
+FETCH_MODES = ('http', 'browser', 'auto')
+DEFAULT_FETCH_MODE = os.getenv('SCRAPEBI_FETCH_MODE', 'browser')
+HTTP_TIMEOUT = float(os.getenv('SCRAPEBI_HTTP_TIMEOUT', 15))
+HTTP_POOL_SIZE = int(os.getenv('SCRAPEBI_HTTP_POOL_SIZE', 20))
+HTTP_CACHE_TTL = int(os.getenv('SCRAPEBI_HTTP_CACHE_TTL', 300))
+HTTP_CACHE_ENTRIES = int(os.getenv('SCRAPEBI_HTTP_CACHE_ENTRIES', 1000))
+# Per-domain overrides, e.g. "news.example.com=60,static.example.com=86400"
+HTTP_CACHE_DOMAIN_TTLS = {
+    domain.strip().lower(): int(ttl)
+    for domain, _, ttl in (item.partition('=') for item in os.getenv('SCRAPEBI_HTTP_CACHE_DOMAIN_TTLS', '').split(','))
+    if domain.strip() and ttl.strip()
+}
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Async backend settings (needs the optional aiohttp package)
+BACKENDS = ('sync', 'async')
+DEFAULT_BACKEND = os.getenv('SCRAPEBI_BACKEND', 'sync')
+ASYNC_MAX_CONNECTIONS = int(os.getenv('SCRAPEBI_ASYNC_CONNECTIONS', 200))
+ASYNC_BROWSER_TABS = int(os.getenv('SCRAPEBI_ASYNC_TABS', 8))
+BULK_MAX_URLS = int(os.getenv('SCRAPEBI_BULK_MAX_URLS', 1000))
+BULK_MAX_CONCURRENCY = int(os.getenv('SCRAPEBI_BULK_MAX_CONCURRENCY', 200))
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Page source endpoint settings (brotli is optional; gzip is always available)
+ENCODED_CACHE_MB = int(os.getenv('SCRAPEBI_ENCODED_CACHE_MB', 64))
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+# Only the head is searched for the title, so <title> elements inside inline SVG are ignored
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.IGNORECASE | re.DOTALL)
+HEAD_END_RE = re.compile(r'</head\s*>|<body[\s>]', re.IGNORECASE)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Parallel extraction settings
+EXTRACT_WORKERS = int(os.getenv('SCRAPEBI_EXTRACT_WORKERS', 0)) or None
+EXTRACT_CHUNK_SIZE = int(os.getenv('SCRAPEBI_EXTRACT_CHUNK_SIZE', 16))
+
+# Diff mode settings: (URL, rule set) baselines kept for batch_extract's diff mode
+DIFF_MAX_BASELINES = int(os.getenv('SCRAPEBI_DIFF_BASELINES', 1000))
+
+# Pagination settings: listings walked step by step by /api/paginate
+PAGINATION_MODES = ('next', 'template', 'scroll')
+PAGINATE_MAX_PAGES = int(os.getenv('SCRAPEBI_PAGINATE_MAX_PAGES', 50))
+# Scrolling stops after this many scrolls in a row that add no elements
+SCROLL_IDLE_STEPS = int(os.getenv('SCRAPEBI_SCROLL_IDLE_STEPS', 2))
+
+# Crawl job settings
+JOB_MAX_CONCURRENCY = int(os.getenv('SCRAPEBI_JOB_MAX_CONCURRENCY', 16))
+JOB_MAX_URLS = int(os.getenv('SCRAPEBI_JOB_MAX_URLS', 100000))
+JOB_DOMAIN_DELAY = float(os.getenv('SCRAPEBI_JOB_DOMAIN_DELAY', 1.0))
+MAX_JOBS = int(os.getenv('SCRAPEBI_MAX_JOBS', 50))
+
+# Page readiness settings
+WAIT_STRATEGIES = ('fixed', 'ready_state', 'network_idle', 'dom_stable', 'selectors')
+DEFAULT_WAIT_STRATEGY = os.getenv('SCRAPEBI_WAIT_STRATEGY', 'dom_stable')
+DEFAULT_MAX_WAIT = float(os.getenv('SCRAPEBI_MAX_WAIT', 15))
+DEFAULT_IDLE_MS = int(os.getenv('SCRAPEBI_IDLE_MS', 500))
+READY_POLL_INTERVAL = 0.05
+
+# Resource policy settings
+TRACKER_URL_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*facebook.net*', '*connect.facebook.com*', '*hotjar.com*', '*segment.io*', '*segment.com*',
+    '*scorecardresearch.com*', '*quantserve.com*', '*newrelic.com*', '*nr-data.net*', '*criteo.*',
+]
+MEDIA_URL_PATTERNS = ['*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.ogg*', '*.wav*']
+FONT_URL_PATTERNS = ['*.woff*', '*.ttf*', '*.otf*', '*.eot*']
+IMAGE_URL_PATTERNS = ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*', '*.bmp*']
+STYLESHEET_URL_PATTERNS = ['*.css*']
+# URL patterns blocked through CDP Network.setBlockedURLs. Image src attributes stay in the DOM
+# when image bytes are blocked; text_images keeps stylesheets so layout-driven lazy loaders still fire.
+RESOURCE_POLICIES = {
+    'full': [],
+    'text_images': TRACKER_URL_PATTERNS + MEDIA_URL_PATTERNS + FONT_URL_PATTERNS + IMAGE_URL_PATTERNS,
+    'text': TRACKER_URL_PATTERNS + MEDIA_URL_PATTERNS + FONT_URL_PATTERNS + IMAGE_URL_PATTERNS
+            + STYLESHEET_URL_PATTERNS,
+}
+# 'auto' picks text or text_images from the attributes the rules extract
+RESOURCE_POLICY_CHOICES = tuple(RESOURCE_POLICIES) + ('auto',)
+DEFAULT_RESOURCE_POLICY = os.getenv('SCRAPEBI_RESOURCE_POLICY', 'full')
+IMAGE_ATTRIBUTES = {'src', 'srcset', 'data-src', 'all', 'html'}
+
+# Records the time of the last DOM mutation so quiescence can be polled cheaply
+DOM_QUIET_SCRIPT = '''
+if (!window.__sbiMutations) {
+    window.__sbiMutations = {last: performance.now()};
+    new MutationObserver(function() {
+        window.__sbiMutations.last = performance.now();
+    }).observe(document, {childList: true, subtree: true, characterData: true});
+}
+return performance.now() - window.__sbiMutations.last;
+'''
+
+# Returns true once every rule selector matches at least one node
+SELECTORS_MATCH_SCRIPT = '''
+return arguments[0].every(function(check) {
+    try {
+        if (check.type === 'xpath') {
+            return document.evaluate(check.selector, document, null,
+                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null;
+        }
+        if (check.type === 'class') return document.getElementsByClassName(check.selector).length > 0;
+        if (check.type === 'id') return document.getElementById(check.selector) !== null;
+        return document.querySelector(check.selector) !== null;
+    } catch (e) {
+        // An invalid selector should not hold the page until the hard cap
+        return true;
+    }
+});
+'''
+
+# Returns, per rule XPath, the matches that are new or changed since the previous call on this page.
+# Nodes already reported are remembered with their serialized form, so only what a step added or
+# changed is sent back; navigating to another page starts over.
+INCREMENTAL_MATCH_SCRIPT = '''
+var xpaths = arguments[0];
+if (!window.__sbiSeen || window.__sbiSeen.length !== xpaths.length) {
+    window.__sbiSeen = xpaths.map(function() { return new WeakMap(); });
+}
+return xpaths.map(function(xpath, i) {
+    var seen = window.__sbiSeen[i], nodes = [], result;
+    try {
+        result = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    } catch (e) {
+        // Expressions such as count(...) return a value instead of nodes
+        try {
+            result = document.evaluate(xpath, document, null, XPathResult.ANY_TYPE, null);
+        } catch (e2) {
+            return {error: String(e2)};
+        }
+        if (result.resultType === XPathResult.NUMBER_TYPE) return {value: result.numberValue};
+        if (result.resultType === XPathResult.STRING_TYPE) return {value: result.stringValue};
+        if (result.resultType === XPathResult.BOOLEAN_TYPE) return {value: result.booleanValue};
+        return {error: String(e)};
+    }
+    for (var j = 0; j < result.snapshotLength; j++) {
+        var node = result.snapshotItem(j);
+        var element = node.nodeType === Node.ELEMENT_NODE;
+        var snapshot = element ? node.outerHTML : node.nodeValue;
+        if (seen.get(node) === snapshot) continue;
+        seen.set(node, snapshot);
+        nodes.push([element ? 'element' : 'text', snapshot]);
+    }
+    return {nodes: nodes};
+});
+'''
+
+# Elements whose outerHTML has to be parsed as a whole document to keep their own tag
+DOCUMENT_TAG_RE = re.compile(r'^\s*<(html|head|body)[\s/>]', re.IGNORECASE)
+
+CLICK_SCRIPT = '''
+arguments[0].scrollIntoView({block: 'center'});
+arguments[0].click();
+'''
+
+SCROLL_SCRIPT = 'window.scrollTo(0, document.documentElement.scrollHeight);'
+ELEMENT_COUNT_SCRIPT = 'return document.getElementsByTagName("*").length;'
+
+def selector_checks(wait_for):
+    """Turn wait_for items (plain CSS strings or extraction rules) into SELECTORS_MATCH_SCRIPT input"""
+    checks = []
+    for item in wait_for:
+        if isinstance(item, dict):
+            checks.append({'type': item.get('selector_type', 'css'), 'selector': item.get('selector', '')})
+        else:
+            checks.append({'type': 'css', 'selector': item})
+    return [check for check in checks if check['selector']]
+
+def resource_policy_for(rules):
+    """Leanest preset that still serves every rule: text_images if any rule reads image URLs or markup"""
+    if not rules:
+        return 'full'
+    for rule in rules:
+        attribute = rule.attribute if isinstance(rule, CompiledRule) else rule.get('attribute', 'text')
+        if attribute in IMAGE_ATTRIBUTES:
+            return 'text_images'
+    return 'text'
+
+
+class ResourceUsage:
+    """Tally of one page load's network requests, built from CDP Network events"""
+
+    def __init__(self):
+        self.types = {}
+        self.bytes_by_type = {}
+        self.finished_by_type = {}
+        self.blocked_by_type = {}
+
+    def feed(self, events):
+        for method, params in events:
+            request_id = params.get('requestId')
+            if method == 'Network.requestWillBeSent':
+                self.types[request_id] = params.get('type', 'Other')
+            elif method == 'Network.loadingFinished':
+                resource_type = self.types.get(request_id, 'Other')
+                self.bytes_by_type[resource_type] = \
+                    self.bytes_by_type.get(resource_type, 0) + params.get('encodedDataLength', 0)
+                self.finished_by_type[resource_type] = self.finished_by_type.get(resource_type, 0) + 1
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                resource_type = params.get('type') or self.types.get(request_id, 'Other')
+                self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+
+
+class ResourceMeter:
+    """Estimates what resource blocking saves, from average sizes and unblocked load times seen so far"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._type_sizes = {}
+        self._full_load_times = {}
+
+    def report(self, url, policy, usage, load_time):
+        """Summarize a page load and fold it into the running averages"""
+        domain = urlparse(url).netloc
+        with self._lock:
+            for resource_type, total in usage.bytes_by_type.items():
+                seen_total, seen_count = self._type_sizes.get(resource_type, (0, 0))
+                self._type_sizes[resource_type] = (seen_total + total,
+                                                   seen_count + usage.finished_by_type[resource_type])
+            if policy == 'full':
+                self._full_load_times[domain] = load_time
+            baseline = self._full_load_times.get(domain)
+            saved = 0
+            for resource_type, blocked in usage.blocked_by_type.items():
+                seen_total, seen_count = self._type_sizes.get(resource_type, (0, 0))
+                if seen_count:
+                    saved += blocked * seen_total // seen_count
+
+        return {
+            'policy': policy,
+            'requests': len(usage.types),
+            'blocked_requests': sum(usage.blocked_by_type.values()),
+            'bytes_transferred': sum(usage.bytes_by_type.values()),
+            'estimated_bytes_saved': saved,
+            'load_time': load_time,
+            'baseline_load_time': baseline,
+            'load_time_saved': round(baseline - load_time, 3) if baseline is not None and policy != 'full' else None
+        }
+
+
+class DriverLauncher:
+    """Resolves the ChromeDriver binary once per process and times every Chrome launch.
+
+    The binary comes from SCRAPEBI_CHROMEDRIVER, the path cached on disk by an earlier run,
+    `chromedriver` on PATH (offline mode), or webdriver-manager, in that order.
+    """
+
+    def __init__(self, explicit_path='', cache_file=None, offline=False):
+        self.explicit_path = explicit_path
+        self.cache_file = cache_file
+        self.offline = offline
+        self.path = None
+        self.source = None
+        self.resolve_time = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'startups': 0, 'startup_time_total': 0.0, 'last_startup_time': None,
+            'recoveries': 0, 'recovery_time_total': 0.0, 'last_recovery_time': None,
+            'failures': 0
+        }
+
+    def resolve(self):
+        """Path to the ChromeDriver binary, resolved on first use"""
+        with self._lock:
+            if self.path is None:
+                started = time.time()
+                self.path, self.source = self._find()
+                self.resolve_time = round(time.time() - started, 3)
+                print(f"ChromeDriver resolved from {self.source} in {self.resolve_time}s: {self.path}")
+            return self.path
+
+    def _find(self):
+        if self.explicit_path:
+            return self.explicit_path, 'SCRAPEBI_CHROMEDRIVER'
+
+        cached = self._read_cache()
+        if cached:
+            return cached, 'disk cache'
+
+        if self.offline:
+            on_path = shutil.which('chromedriver')
+            if on_path:
+                return on_path, 'PATH'
+            raise RuntimeError("Offline mode: set SCRAPEBI_CHROMEDRIVER or put chromedriver on PATH")
+
+        path = ChromeDriverManager().install()
+        self._write_cache(path)
+        return path, 'webdriver-manager'
+
+    def _read_cache(self):
+        if not self.cache_file:
+            return None
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                path = json.load(f).get('path')
+        except (OSError, ValueError, AttributeError):
+            return None
+        return path if path and os.path.isfile(path) else None
+
+    def _write_cache(self, path):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump({'path': path, 'resolved_at': datetime.now().isoformat()}, f)
+        except OSError as e:
+            print(f"Could not cache ChromeDriver path: {e}")
+
+    def invalidate(self):
+        """Forget the resolved path so the next launch resolves it again"""
+        with self._lock:
+            self.path = None
+            if self.cache_file and os.path.exists(self.cache_file):
+                try:
+                    os.remove(self.cache_file)
+                except OSError:
+                    pass
+
+    def launch(self, options, recovery=False):
+        """Start Chrome with the resolved driver, recording how long the launch took"""
+        started = time.time()
+        path = self.resolve()
+        try:
+            driver = webdriver.Chrome(service=Service(path), options=options)
+        except WebDriverException:
+            stale = not os.path.isfile(path) or (self.source == 'disk cache' and not self.offline)
+            if not stale or self.source == 'SCRAPEBI_CHROMEDRIVER':
+                self.stats['failures'] += 1
+                raise
+            # The cached binary vanished or no longer matches Chrome: resolve again once
+            self.invalidate()
+            try:
+                driver = webdriver.Chrome(service=Service(self.resolve()), options=options)
+            except WebDriverException:
+                self.stats['failures'] += 1
+                raise
+
+        elapsed = round(time.time() - started, 3)
+        kind, counter = ('recovery', 'recoveries') if recovery else ('startup', 'startups')
+        with self._lock:
+            self.stats[counter] += 1
+            self.stats[f'{kind}_time_total'] += elapsed
+            self.stats[f'last_{kind}_time'] = elapsed
+        return driver
+
+    def status(self):
+        """Get the resolved binary and launch timings"""
+        with self._lock:
+            stats = dict(self.stats)
+        for kind, counter in (('startup', 'startups'), ('recovery', 'recoveries')):
+            total = stats[f'{kind}_time_total']
+            stats[f'{kind}_time_avg'] = round(total / stats[counter], 3) if stats[counter] else None
+            stats[f'{kind}_time_total'] = round(total, 3)
+        return {
+            'path': self.path,
+            'source': self.source,
+            'resolve_time': self.resolve_time,
+            'offline': self.offline,
+            'stats': stats
+        }
+
 
 class SeleniumScraper:
     """Selenium-based web scraper with advanced capabilities"""
@@ -37,11 +608,16 @@ class SeleniumScraper:
         self.driver = None
         self.headless = headless
         self.html_content = ""
-        self.soup = None
+        self.document = None
         self.last_used = None
+        self.pages_scraped = 0
+        self.last_ready = None
+        self.last_resources = None
+        self.resource_policy = None
+        self._usage = None
 
-    def init_driver(self):
-        """Initialize Chrome WebDriver"""
+    def init_driver(self, recovery=False):
+        """Initialize Chrome WebDriver; `recovery` marks a restart after a broken session"""
         chrome_options = Options()
         if self.headless:
             chrome_options.add_argument('--headless')
@@ -49,59 +625,210 @@ class SeleniumScraper:
         chrome_options.add_argument('--disable-dev-shm-usage')
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        # Lean profile: no extensions, background traffic or audio
+        for flag in ('--disable-extensions', '--disable-background-networking', '--disable-sync',
+                     '--disable-default-apps', '--disable-component-update', '--no-first-run', '--mute-audio'):
+            chrome_options.add_argument(flag)
+        if DEFAULT_RESOURCE_POLICY in ('text', 'text_images'):
+            # Image loading is a browser-wide pref, so it follows the default policy
+            chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        chrome_options.add_argument(f'--user-agent={USER_AGENT}')
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
+        # Performance logs carry the CDP network events used by the network_idle strategy
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
 
         try:
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            self.driver = driver_launcher.launch(chrome_options, recovery)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.resource_policy = None
             self.last_used = time.time()
+            self.pages_scraped = 0
             print("WebDriver initialized successfully")
             return True
         except Exception as e:
             print(f"Error initializing driver: {e}")
             return False
+
+    def is_alive(self):
+        """Check whether the WebDriver session still responds"""
+        if not self.driver:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception as driver_error:
+            print(f"Driver session invalid: {driver_error}")
+            return False
     
-    def scrape_url(self, url, wait_time=3):
+    def wait_until_ready(self, strategy=DEFAULT_WAIT_STRATEGY, max_wait=DEFAULT_MAX_WAIT,
+                         idle_ms=DEFAULT_IDLE_MS, wait_for=None, wait_time=3):
+        """Wait until the loaded page is ready, never longer than max_wait seconds.
+
+        Returns True when the strategy's condition was met, False when the cap was hit.
+        """
+        deadline = time.time() + max_wait
+        if strategy == 'fixed':
+            time.sleep(min(wait_time, max_wait))
+            return True
+
+        ready = self._wait_ready_state(deadline)
+        if strategy == 'network_idle':
+            ready = self._wait_network_idle(deadline, idle_ms) and ready
+        elif strategy == 'dom_stable':
+            ready = self._wait_dom_stable(deadline, idle_ms) and ready
+        elif strategy == 'selectors':
+            ready = self._wait_selectors(deadline, wait_for or []) and ready
+        return ready
+
+    def _wait_ready_state(self, deadline):
+        """Wait for document.readyState to reach 'complete'"""
+        while time.time() < deadline:
+            if self.driver.execute_script("return document.readyState") == 'complete':
+                return True
+            time.sleep(READY_POLL_INTERVAL)
+        return False
+
+    def _drain_network_log(self):
+        """Read pending CDP Network events as (method, params), adding them to the current tally.
+
+        Returns None when the performance log is unavailable.
+        """
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            print(f"Performance log unavailable: {e}")
+            return None
+
+        events = []
+        for entry in entries:
+            message = json.loads(entry['message']).get('message', {})
+            method = message.get('method', '')
+            if method.startswith('Network.'):
+                events.append((method, message.get('params', {})))
+        if self._usage is not None:
+            self._usage.feed(events)
+        return events
+
+    def _apply_resource_policy(self, policy):
+        """Block the policy's URL patterns for subsequent loads"""
+        if policy == self.resource_policy:
+            return
+        try:
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': RESOURCE_POLICIES[policy]})
+            self.resource_policy = policy
+        except Exception as e:
+            print(f"Could not apply resource policy {policy}: {e}")
+
+    def _wait_network_idle(self, deadline, idle_ms):
+        """Wait until no requests have been in flight for idle_ms, using CDP performance logs"""
+        in_flight = set()
+        last_activity = time.time()
+        while time.time() < deadline:
+            events = self._drain_network_log()
+            if events is None:
+                print("Falling back to DOM quiescence")
+                return self._wait_dom_stable(deadline, idle_ms)
+
+            for method, params in events:
+                request_id = params.get('requestId')
+                if method == 'Network.requestWillBeSent':
+                    in_flight.add(request_id)
+                    last_activity = time.time()
+                elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                    in_flight.discard(request_id)
+                    last_activity = time.time()
+
+            if not in_flight and (time.time() - last_activity) * 1000 >= idle_ms:
+                return True
+            time.sleep(READY_POLL_INTERVAL)
+        return False
+
+    def _wait_dom_stable(self, deadline, idle_ms):
+        """Wait until the DOM has not mutated for idle_ms"""
+        while time.time() < deadline:
+            if self.driver.execute_script(DOM_QUIET_SCRIPT) >= idle_ms:
+                return True
+            time.sleep(READY_POLL_INTERVAL)
+        return False
+
+    def _wait_selectors(self, deadline, wait_for):
+        """Wait until every selector (plain CSS string or extraction rule) matches"""
+        checks = selector_checks(wait_for)
+        while time.time() < deadline:
+            if self.driver.execute_script(SELECTORS_MATCH_SCRIPT, checks):
+                return True
+            time.sleep(READY_POLL_INTERVAL)
+        return False
+
+    def scrape_url(self, url, wait_time=3, wait_strategy=DEFAULT_WAIT_STRATEGY,
+                   max_wait=DEFAULT_MAX_WAIT, idle_ms=DEFAULT_IDLE_MS, wait_for=None,
+                   resource_policy=DEFAULT_RESOURCE_POLICY):
         """Scrape a URL and return HTML content"""
+        error = self.open_page(url, wait_time, wait_strategy, max_wait, idle_ms, wait_for, resource_policy)
+        if error:
+            return None, error
+        try:
+            self.html_content = self.driver.page_source
+        except Exception as e:
+            return None, str(e)
+        self.document = ParsedDocument(self.html_content)
+        return self.html_content, None
+
+    def open_page(self, url, wait_time=3, wait_strategy=DEFAULT_WAIT_STRATEGY,
+                  max_wait=DEFAULT_MAX_WAIT, idle_ms=DEFAULT_IDLE_MS, wait_for=None,
+                  resource_policy=DEFAULT_RESOURCE_POLICY):
+        """Load a URL and wait until it is ready, without capturing its source. Returns an error or None"""
         try:
             # Check if driver exists and is valid
             if not self.driver:
                 if not self.init_driver():
-                    return None, "Failed to initialize WebDriver"
+                    return "Failed to initialize WebDriver"
             
             # Try to use existing driver, reinitialize if session is invalid
-            try:
-                # Test if driver is still responsive
-                self.driver.current_url
-            except Exception as driver_error:
-                print(f"Driver session invalid, reinitializing: {driver_error}")
+            if not self.is_alive():
+                print("Reinitializing WebDriver")
                 try:
                     self.driver.quit()
                 except:
                     pass
                 self.driver = None
-                if not self.init_driver():
-                    return None, "Failed to reinitialize WebDriver"
+                if not self.init_driver(recovery=True):
+                    return "Failed to reinitialize WebDriver"
             
+            self._apply_resource_policy(resource_policy)
+            # Drop events left over from the previous page
+            self._usage = None
+            self._drain_network_log()
+            self._usage = ResourceUsage()
+
+            started = time.time()
             self.driver.get(url)
-            time.sleep(wait_time)  # Wait for page to load
+            ready = self.wait_until_ready(wait_strategy, max_wait, idle_ms, wait_for, wait_time)
+            self.last_ready = {
+                'wait_strategy': wait_strategy,
+                'time_to_ready': round(time.time() - started, 3),
+                'ready': ready
+            }
 
             # Wait for body to be present
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
 
-            self.html_content = self.driver.page_source
-            self.soup = BeautifulSoup(self.html_content, 'html.parser')
-            self.last_used = time.time()
+            self._drain_network_log()
+            self.last_resources = resource_meter.report(
+                url, self.resource_policy, self._usage, self.last_ready['time_to_ready']
+            )
+            self._usage = None
 
-            return self.html_content, None
+            self.last_used = time.time()
+            self.pages_scraped += 1
+            return None
         except TimeoutException:
-            return None, "Page load timeout"
+            return "Page load timeout"
         except Exception as e:
             error_msg = str(e)
             # If it's a session error, try to reinitialize
@@ -112,282 +839,2713 @@ class SeleniumScraper:
                 except:
                     pass
                 self.driver = None
-                if self.init_driver():
+                if self.init_driver(recovery=True):
                     # Retry the request
-                    return self.scrape_url(url, wait_time)
-            return None, error_msg
+                    return self.open_page(url, wait_time, wait_strategy, max_wait, idle_ms, wait_for,
+                                          resource_policy)
+            return error_msg
+
+    def new_matches(self, xpaths):
+        """Rule matches that are new or changed on the open page since the last call (INCREMENTAL_MATCH_SCRIPT)"""
+        return self.driver.execute_script(INCREMENTAL_MATCH_SCRIPT, xpaths)
+
+    def follow_next(self, selector, visited=(), wait_strategy=DEFAULT_WAIT_STRATEGY, max_wait=DEFAULT_MAX_WAIT,
+                    idle_ms=DEFAULT_IDLE_MS, wait_time=3):
+        """Go to the next page through the first element matching a CSS selector.
+
+        Links are navigated to directly; anything else (buttons, "load more") is clicked in place.
+        Returns False when nothing matches or the link points at a URL in `visited`.
+        """
+        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+        if not elements:
+            return False
+        element = elements[0]
+        href = element.get_attribute('href') if element.tag_name.lower() == 'a' else None
+        if href and (href.lower().startswith('javascript:')
+                     or urldefrag(href)[0] == urldefrag(self.driver.current_url)[0]):
+            # href="#" and javascript: links are handled by the page's scripts
+            href = None
+        if href:
+            if href in visited:
+                return False
+            self.driver.get(href)
+        else:
+            self.driver.execute_script(CLICK_SCRIPT, element)
+        # A click may only change part of the page, so load events are not enough to wait for
+        if wait_strategy in ('fixed', 'ready_state'):
+            wait_strategy = 'dom_stable'
+        self.wait_until_ready(wait_strategy, max_wait, idle_ms, None, wait_time)
+        self.last_used = time.time()
+        return True
+
+    def scroll_down(self, max_wait=DEFAULT_MAX_WAIT, idle_ms=DEFAULT_IDLE_MS):
+        """Scroll to the bottom, wait for the DOM to settle and return the page's element count"""
+        self.driver.execute_script(SCROLL_SCRIPT)
+        self._wait_dom_stable(time.time() + max_wait, idle_ms)
+        self.last_used = time.time()
+        return self.element_count()
+
+    def element_count(self):
+        """Number of elements on the open page"""
+        return self.driver.execute_script(ELEMENT_COUNT_SCRIPT)
+    
+    def extract_by_rule(self, rule, document=None):
+        """Extract data based on extraction rule, from `document` or the last scraped page"""
+        document = document if document is not None else self.document
+        if document is None:
+            return []
+        return extraction_engine.extract(document.tree, rule)
     
-    def get_element_info(self, element):
-        """Get detailed information about an element"""
+    def close(self):
+        """Close the WebDriver"""
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"Error closing driver: {e}")
+            self.driver = None
+
+
+class WebDriverPool:
+    """Bounded pool of warm SeleniumScraper instances shared by request threads"""
+
+    def __init__(self, size=2, headless=False, max_pages=100, max_idle=600, checkout_timeout=60):
+        self.size = max(1, size)
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {'checkouts': 0, 'waits': 0, 'timeouts': 0, 'recycled': 0, 'unhealthy': 0}
+
+    def checkout(self, timeout=None):
+        """Borrow a scraper, waiting up to `timeout` seconds when every driver is busy"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise RuntimeError("WebDriver pool is closed")
+                if self._idle:
+                    worker = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    worker = SeleniumScraper(headless=self.headless)
+                    self._created += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise TimeoutError(f"All {self.size} browser sessions are busy, try again shortly")
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self.stats['checkouts'] += 1
+
+        # Health checks run outside the lock so a slow probe doesn't block other threads
+        if worker.driver:
+            idle_for = time.time() - (worker.last_used or 0)
+            if self.max_idle and idle_for > self.max_idle:
+                self.stats['recycled'] += 1
+                worker.close()
+            elif not worker.is_alive():
+                self.stats['unhealthy'] += 1
+                worker.close()
+        return worker
+
+    def checkin(self, worker):
+        """Return a scraper to the pool, recycling it once it has served max_pages"""
+        if self.max_pages and worker.pages_scraped >= self.max_pages:
+            self.stats['recycled'] += 1
+            worker.close()
+        with self._cond:
+            self._in_use -= 1
+            if self._closed:
+                self._created -= 1
+                worker.close()
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Context manager wrapping checkout/checkin"""
+        worker = self.checkout(timeout)
+        try:
+            yield worker
+        finally:
+            self.checkin(worker)
+
+    def status(self):
+        """Get current pool usage and counters"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'stats': dict(self.stats)
+            }
+
+    def close(self):
+        """Quit every idle driver; busy drivers are closed when checked back in"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.close()
+
+class HttpFetcher:
+    """Plain HTTP fetcher for static pages, backed by a pooled requests.Session.
+
+    Responses are cached per URL. A cached page younger than its domain's TTL is served
+    without a request; an older one is revalidated with If-None-Match/If-Modified-Since.
+    """
+
+    def __init__(self, pool_size=20, timeout=15, cache_ttl=300, domain_ttls=None, max_cache_entries=1000):
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.domain_ttls = domain_ttls or {}
+        self.max_cache_entries = max_cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9'
+        })
+
+    def ttl_for(self, url):
+        """Freshness lifetime for a URL: the most specific matching domain override, else the default"""
+        host = (urlparse(url).hostname or '').lower()
+        while host:
+            if host in self.domain_ttls:
+                return self.domain_ttls[host]
+            host = host.partition('.')[2]
+        return self.cache_ttl
+
+    def fetch(self, url, use_cache=True):
+        """Fetch a URL and return (html, error, cache_status).
+
+        cache_status is 'hit' (served from cache), 'revalidated' (server answered 304),
+        'miss' (full download) or None when the cache was bypassed.
+        """
+        entry, headers = self._lookup(url) if use_cache else (None, {})
+        if entry is not None and not headers:
+            return entry['html'], None, 'hit'
+
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+            if response.status_code == 304 and entry is not None:
+                return self._revalidated(entry), None, 'revalidated'
+            if response.status_code >= 400:
+                return None, f"HTTP {response.status_code}", None
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type and 'xml' not in content_type:
+                return None, f"Unsupported content type: {content_type}", None
+            # requests falls back to ISO-8859-1 for text/* without a charset
+            if 'charset' not in content_type.lower():
+                response.encoding = response.apparent_encoding
+            html = response.text
+        except requests.RequestException as e:
+            return None, str(e), None
+
+        if not use_cache:
+            return html, None, None
+        return html, None, self._store(url, html, response.headers)
+
+    def _lookup(self, url):
+        """Find a cached response: (entry, {}) when fresh, (entry, conditional headers) when stale,
+        (None, {}) when absent"""
+        ttl = self.ttl_for(url)
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return None, {}
+            self._cache.move_to_end(url)
+            if time.time() - entry['fetched_at'] < ttl:
+                self.stats['hits'] += 1
+                return entry, {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        # Without validators a stale entry is only good as a miss
+        return (entry, headers) if headers else (None, {})
+
+    def _revalidated(self, entry):
+        """Mark a cached response fresh after a 304 and return its HTML"""
+        with self._lock:
+            entry['fetched_at'] = time.time()
+            self.stats['revalidated'] += 1
+        return entry['html']
+
+    def _store(self, url, html, headers):
+        """Record a full download, caching it unless the server forbids it; returns 'miss'"""
+        with self._lock:
+            self.stats['misses'] += 1
+        if 'no-store' not in headers.get('Cache-Control', '').lower():
+            self._remember(url, html, headers)
+        return 'miss'
+
+    def _remember(self, url, html, headers):
+        """Cache a response with its validators, dropping the least recently used past the limit"""
+        with self._lock:
+            self._cache[url] = {
+                'html': html,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fetched_at': time.time()
+            }
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+
+    def status(self):
+        """Get response cache usage and counters"""
+        with self._lock:
+            return {
+                'entries': len(self._cache),
+                'max_entries': self.max_cache_entries,
+                'default_ttl': self.cache_ttl,
+                'domain_ttls': dict(self.domain_ttls),
+                'stats': dict(self.stats)
+            }
+
+
+# Markers of client-rendered apps whose HTML is only a mount point
+JS_SHELL_PATTERNS = [
+    re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.I),
+    re.compile(r'<noscript[^>]*>[^<]*(enable|requires?)[^<]*javascript', re.I),
+]
+STRIP_NON_TEXT_RE = re.compile(r'<(script|style|noscript|template)[^>]*>.*?</\1>', re.I | re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+
+def looks_like_js_shell(html, min_text=200):
+    """Guess whether HTML is an empty shell that needs JavaScript to render"""
+    if any(pattern.search(html) for pattern in JS_SHELL_PATTERNS):
+        return True
+    text = TAG_RE.sub(' ', STRIP_NON_TEXT_RE.sub(' ', html))
+    return len(' '.join(text.split())) < min_text
+
+def rules_match(document, rules):
+    """Check that at least one rule extracts something from a parsed page"""
+    return any(scraper.extract_by_rule(rule, document) for rule in rules)
+
+def assess_http_page(html, error, rules):
+    """Decide whether an HTTP result can stand in for a browser load in auto mode.
+
+    Returns (fallback_reason, document); the reason is None when the page is usable.
+    """
+    if error:
+        return error, None
+    if looks_like_js_shell(html):
+        return 'Page looks like a JavaScript shell', None
+    document = ParsedDocument(html)
+    if rules and not rules_match(document, rules):
+        return 'Rule selectors matched nothing', None
+    return None, document
+
+def fetch_page(url, mode=DEFAULT_FETCH_MODE, rules=None, use_cache=True, backend=DEFAULT_BACKEND, **wait_options):
+    """Fetch a page over plain HTTP, a pooled browser, or HTTP with browser fallback.
+
+    Returns (html, error, info) where info describes how the page was fetched and
+    carries the ParsedDocument under 'document' when one was built along the way.
+    The async backend does the same on its event loop without tying up a pooled driver.
+    """
+    if backend == 'async':
+        return async_backend.run(async_backend.fetch_page(url, mode, rules, use_cache, **wait_options))
+
+    info = {'mode': mode, 'fetched_with': None, 'fallback_reason': None, 'readiness': None,
+            'document': None, 'http_cache': None, 'resources': None}
+
+    if mode in ('http', 'auto'):
+        started = time.time()
+        html, error, info['http_cache'] = http_fetcher.fetch(url, use_cache)
+        info['fetch_time'] = round(time.time() - started, 3)
+        if mode == 'http':
+            info['fetched_with'] = 'http'
+            return html, error, info
+
+        info['fallback_reason'], document = assess_http_page(html, error, rules)
+        if not info['fallback_reason']:
+            info['fetched_with'] = 'http'
+            info['document'] = document
+            return html, None, info
+
+    if wait_options.get('resource_policy') == 'auto':
+        wait_options['resource_policy'] = resource_policy_for(rules)
+
+    with driver_pool.session() as worker:
+        html, error = worker.scrape_url(url, **wait_options)
+        info['readiness'] = worker.last_ready
+        info['resources'] = worker.last_resources
+        if not error:
+            info['document'] = worker.document
+    info['fetched_with'] = 'browser'
+    return html, error, info
+
+def store_session(url, html, document=None):
+    """Store scraped HTML and return its session ID, caching the parsed document if given"""
+    session_id = str(uuid.uuid4())
+    scraped_data_store.add(session_id, url, html)
+    if document is not None:
+        document_cache.put(session_id, document)
+    return session_id
+
+
+class AsyncHttpFetcher:
+    """aiohttp counterpart of HttpFetcher, sharing its response cache"""
+
+    def __init__(self, session, cache):
+        self.session = session
+        self.cache = cache
+
+    async def fetch(self, url, use_cache=True):
+        """Fetch a URL and return (html, error, cache_status), as HttpFetcher.fetch does"""
+        entry, headers = self.cache._lookup(url) if use_cache else (None, {})
+        if entry is not None and not headers:
+            return entry['html'], None, 'hit'
+
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304 and entry is not None:
+                    return self.cache._revalidated(entry), None, 'revalidated'
+                if response.status >= 400:
+                    return None, f"HTTP {response.status}", None
+                content_type = response.headers.get('Content-Type', '')
+                if content_type and 'html' not in content_type and 'xml' not in content_type:
+                    return None, f"Unsupported content type: {content_type}", None
+                # aiohttp detects the encoding itself when the header has no charset
+                html = await response.text(errors='replace')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return None, str(e) or e.__class__.__name__, None
+
+        if not use_cache:
+            return html, None, None
+        return html, None, self.cache._store(url, html, response.headers)
+
+
+class CdpSession:
+    """Minimal async Chrome DevTools Protocol client for one page target"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = []
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                if 'id' in data:
+                    future = self._pending.pop(data['id'], None)
+                    if future is None or future.done():
+                        continue
+                    if 'error' in data:
+                        future.set_exception(RuntimeError(data['error'].get('message', 'CDP error')))
+                    else:
+                        future.set_result(data.get('result', {}))
+                else:
+                    for listener in self._listeners:
+                        listener(data.get('method', ''), data.get('params', {}))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('CDP connection closed'))
+            self._pending.clear()
+
+    def on_event(self, listener):
+        """Call listener(method, params) for every CDP event"""
+        self._listeners.append(listener)
+
+    async def send(self, method, params=None, timeout=30):
+        """Send a CDP command and wait for its result"""
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        await self.ws.send_json({'id': self._next_id, 'method': method, 'params': params or {}})
+        return await asyncio.wait_for(future, timeout)
+
+    async def evaluate(self, expression, timeout=30):
+        """Evaluate a JavaScript expression in the page and return its value"""
+        result = await self.send('Runtime.evaluate', {'expression': expression, 'returnByValue': True}, timeout)
+        if 'exceptionDetails' in result:
+            raise RuntimeError(result['exceptionDetails'].get('text', 'JavaScript error'))
+        return result.get('result', {}).get('value')
+
+    async def close(self):
+        self._reader.cancel()
+        await self.ws.close()
+
+
+class AsyncBrowser:
+    """One Chrome driven over async CDP, loading each concurrent page in its own tab.
+
+    Chrome is started through SeleniumScraper so it gets the same profile, user agent and
+    driver resolution as the pool; pages are then loaded over CDP without WebDriver.
+    """
+
+    def __init__(self, session, max_tabs=8, headless=True):
+        self.session = session
+        self.headless = headless
+        self._tabs = asyncio.Semaphore(max_tabs)
+        self._start_lock = asyncio.Lock()
+        self.worker = None
+        self.address = None
+
+    async def _ensure_started(self):
+        async with self._start_lock:
+            loop = asyncio.get_running_loop()
+            if self.worker is not None and await loop.run_in_executor(None, self.worker.is_alive):
+                return
+            recovery = self.worker is not None
+            if recovery:
+                await loop.run_in_executor(None, self.worker.close)
+            worker = SeleniumScraper(headless=self.headless)
+            if not await loop.run_in_executor(None, worker.init_driver, recovery):
+                raise RuntimeError("Failed to initialize WebDriver")
+            self.worker = worker
+            self.address = worker.driver.capabilities['goog:chromeOptions']['debuggerAddress']
+
+    async def _open_tab(self):
+        # Recent Chrome versions only accept PUT for /json/new
+        async with self.session.put(f'http://{self.address}/json/new?about:blank') as response:
+            return await response.json(content_type=None)
+
+    async def _close_tab(self, target_id):
+        try:
+            async with self.session.get(f'http://{self.address}/json/close/{target_id}') as response:
+                await response.read()
+        except aiohttp.ClientError:
+            pass
+
+    async def scrape_url(self, url, wait_time=3, wait_strategy=DEFAULT_WAIT_STRATEGY,
+                         max_wait=DEFAULT_MAX_WAIT, idle_ms=DEFAULT_IDLE_MS, wait_for=None,
+                         resource_policy=DEFAULT_RESOURCE_POLICY):
+        """Load a URL in a fresh tab and return (html, error, details).
+
+        Takes the same options as SeleniumScraper.scrape_url. Many loads share this object,
+        so readiness and resource reports come back in `details` rather than as attributes.
+        """
+        async with self._tabs:
+            try:
+                await self._ensure_started()
+                target = await self._open_tab()
+            except Exception as e:
+                return None, str(e), {}
+
+            cdp = None
+            try:
+                cdp = CdpSession(await self.session.ws_connect(target['webSocketDebuggerUrl'], max_msg_size=0))
+                usage = ResourceUsage()
+                activity = {'in_flight': set(), 'last': time.time(), 'loaded': False}
+
+                def track(method, params):
+                    if method == 'Page.loadEventFired':
+                        activity['loaded'] = True
+                    if not method.startswith('Network.'):
+                        return
+                    usage.feed([(method, params)])
+                    if method == 'Network.requestWillBeSent':
+                        activity['in_flight'].add(params.get('requestId'))
+                        activity['last'] = time.time()
+                    elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                        activity['in_flight'].discard(params.get('requestId'))
+                        activity['last'] = time.time()
+
+                cdp.on_event(track)
+                await cdp.send('Page.enable')
+                await cdp.send('Network.enable')
+                await cdp.send('Network.setBlockedURLs', {'urls': RESOURCE_POLICIES[resource_policy]})
+                await cdp.send('Page.addScriptToEvaluateOnNewDocument', {
+                    'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+                })
+
+                started = time.time()
+                navigation = await cdp.send('Page.navigate', {'url': url}, timeout=max_wait)
+                if navigation.get('errorText'):
+                    return None, navigation['errorText'], {}
+                ready = await self._wait_until_ready(cdp, activity, wait_strategy, max_wait,
+                                                     idle_ms, wait_for, wait_time)
+                time_to_ready = round(time.time() - started, 3)
+                html = await cdp.evaluate('document.documentElement.outerHTML')
+                return html, None, {
+                    'readiness': {'wait_strategy': wait_strategy, 'time_to_ready': time_to_ready, 'ready': ready},
+                    'resources': resource_meter.report(url, resource_policy, usage, time_to_ready)
+                }
+            except Exception as e:
+                return None, str(e) or e.__class__.__name__, {}
+            finally:
+                if cdp is not None:
+                    await cdp.close()
+                await self._close_tab(target['id'])
+
+    async def _wait_until_ready(self, cdp, activity, strategy, max_wait, idle_ms, wait_for, wait_time):
+        """Async counterpart of SeleniumScraper.wait_until_ready"""
+        deadline = time.time() + max_wait
+        if strategy == 'fixed':
+            await asyncio.sleep(min(wait_time, max_wait))
+            return True
+
+        # The load event is the CDP equivalent of document.readyState reaching 'complete'
+        ready = await self._poll(deadline, lambda: activity['loaded'], bool)
+        if strategy == 'network_idle':
+            while time.time() < deadline:
+                if not activity['in_flight'] and (time.time() - activity['last']) * 1000 >= idle_ms:
+                    return ready
+                await asyncio.sleep(READY_POLL_INTERVAL)
+            return False
+        if strategy == 'dom_stable':
+            script = f'(function() {{ {DOM_QUIET_SCRIPT} }})()'
+            return await self._poll(deadline, lambda: cdp.evaluate(script), lambda quiet: quiet >= idle_ms) and ready
+        if strategy == 'selectors':
+            script = f'(function() {{ {SELECTORS_MATCH_SCRIPT} }}).apply(null, [{json.dumps(selector_checks(wait_for or []))}])'
+            return await self._poll(deadline, lambda: cdp.evaluate(script), bool) and ready
+        return ready
+
+    async def _poll(self, deadline, probe, done):
+        """Poll probe() (a value or awaitable) until done(value) or the deadline"""
+        while time.time() < deadline:
+            value = probe()
+            if asyncio.iscoroutine(value):
+                value = await value
+            if done(value):
+                return True
+            await asyncio.sleep(READY_POLL_INTERVAL)
+        return False
+
+    async def close(self):
+        if self.worker is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.worker.close)
+            self.worker = None
+
+
+class AsyncBackend:
+    """Runs fetches on an asyncio event loop in a background thread.
+
+    Sync code (Flask routes, crawl jobs) submits coroutines with run(); the loop keeps
+    hundreds of HTTP fetches and a tab per concurrent browser load in flight at once.
+    """
+
+    def __init__(self, max_connections=200, max_tabs=8, headless=True):
+        self.max_connections = max_connections
+        self.max_tabs = max_tabs
+        self.headless = headless
+        self.loop = None
+        self.http = None
+        self.browser = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self.loop is not None:
+                return
+            if aiohttp is None:
+                raise RuntimeError("The async backend needs aiohttp (pip install aiohttp)")
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name='scrapebi-async', daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._setup(), self.loop).result()
+
+    async def _setup(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=HTTP_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            headers=dict(http_fetcher.session.headers)
+        )
+        self.http = AsyncHttpFetcher(self._session, http_fetcher)
+        self.browser = AsyncBrowser(self._session, self.max_tabs, self.headless)
+
+    def submit(self, coro):
+        """Schedule a coroutine on the backend loop and return its concurrent.futures.Future"""
+        self._start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """Run a coroutine on the backend loop and wait for its result"""
+        return self.submit(coro).result()
+
+    async def fetch_page(self, url, mode=DEFAULT_FETCH_MODE, rules=None, use_cache=True, **wait_options):
+        """Async counterpart of fetch_page, returning the same (html, error, info)"""
+        info = {'mode': mode, 'fetched_with': None, 'fallback_reason': None, 'readiness': None,
+                'document': None, 'http_cache': None, 'resources': None}
+        loop = asyncio.get_running_loop()
+
+        if mode in ('http', 'auto'):
+            started = time.time()
+            html, error, info['http_cache'] = await self.http.fetch(url, use_cache)
+            info['fetch_time'] = round(time.time() - started, 3)
+            if mode == 'http':
+                info['fetched_with'] = 'http'
+                return html, error, info
+
+            # Parsing is CPU work, keep it off the event loop
+            info['fallback_reason'], document = await loop.run_in_executor(
+                None, assess_http_page, html, error, rules
+            )
+            if not info['fallback_reason']:
+                info['fetched_with'] = 'http'
+                info['document'] = document
+                return html, None, info
+
+        if wait_options.get('resource_policy') == 'auto':
+            wait_options['resource_policy'] = resource_policy_for(rules)
+
+        html, error, details = await self.browser.scrape_url(url, **wait_options)
+        info['readiness'] = details.get('readiness')
+        info['resources'] = details.get('resources')
+        info['fetched_with'] = 'browser'
+        return html, error, info
+
+    async def fetch_many(self, urls, sink, mode=DEFAULT_FETCH_MODE, rules=None, concurrency=50, **options):
+        """Fetch URLs concurrently, putting (url, html, error, info) on `sink` as each finishes,
+        then None"""
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch_one(url):
+            async with limit:
+                try:
+                    html, error, info = await self.fetch_page(url, mode, rules, **dict(options))
+                except Exception as e:
+                    html, error, info = None, str(e), None
+            sink.put((url, html, error, info))
+
+        try:
+            await asyncio.gather(*(fetch_one(url) for url in urls))
+        finally:
+            sink.put(None)
+
+    def close(self):
+        """Close the browser and HTTP session and stop the loop"""
+        with self._lock:
+            if self.loop is None:
+                return
+            loop, self.loop = self.loop, None
+
+        async def shutdown():
+            await self.browser.close()
+            await self._session.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(30)
+        except Exception as e:
+            print(f"Error closing async backend: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def read_snapshot_file(path):
+    """Load and decompress a snapshot file written by PageStore"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise OSError('zstandard is not installed')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = gzip.decompress(data)
+    return data.decode('utf-8')
+
+
+class PageStore:
+    """Content-addressed session page store with a memory budget.
+
+    Each distinct HTML snapshot is kept once, keyed by its SHA-256, and sessions reference
+    snapshots. Least recently used snapshots spill to compressed files and reload on access.
+    Supports the dict operations the routes use (`in`, `[]`, `get`, assignment, `del`).
+    Sessions unused for `ttl` seconds are dropped entirely.
+    """
+
+    SESSION_SUFFIX = '.session.json'
+    SNAPSHOT_SUFFIXES = ('.html.zst', '.html.gz')
+    TEMP_SUFFIX = '.tmp'
+
+    def __init__(self, directory, max_memory_bytes, max_disk_bytes, ttl=0, codec='zstd'):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.codec = codec if codec == 'gzip' or zstandard is not None else 'gzip'
+        self._sessions = OrderedDict()
+        self._snapshots = OrderedDict()
+        self._latest_by_url = {}
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._last_sweep = time.time()
+        self._lock = threading.RLock()
+        self.stats = {'spills': 0, 'reloads': 0, 'expired': 0, 'disk_evictions': 0, 'deduplicated': 0}
+        os.makedirs(directory, exist_ok=True)
+        # Extraction worker processes import this module but never use the store; they must not
+        # prune files the main process is still using
+        if multiprocessing.parent_process() is None:
+            self._load_index()
+
+    def _load_index(self):
+        """Pick up snapshots and sessions left on disk by a previous run"""
+        for name in os.listdir(self.directory):
+            if name.endswith(self.TEMP_SUFFIX):
+                # A write cut off by a crash
+                self._delete_file(os.path.join(self.directory, name))
+                continue
+            for suffix in self.SNAPSHOT_SUFFIXES:
+                if name.endswith(suffix):
+                    path = os.path.join(self.directory, name)
+                    disk_size = os.path.getsize(path)
+                    self._snapshots[name[:-len(suffix)]] = {
+                        'html': None, 'size': None, 'path': path, 'disk_size': disk_size, 'refs': 0
+                    }
+                    self._disk_bytes += disk_size
+
+        sessions = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SESSION_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if session.get('digest') not in self._snapshots:
+                # Its snapshot never reached disk
+                self._delete_file(path)
+                continue
+            sessions.append((name[:-len(self.SESSION_SUFFIX)], session))
+
+        for session_id, session in sorted(sessions, key=lambda item: item[1].get('last_access', 0)):
+            session.setdefault('unchanged', False)
+            session.setdefault('previous_session_id', None)
+            self._sessions[session_id] = session
+            self._snapshots[session['digest']]['refs'] += 1
+            self._latest_by_url[session['url']] = (session['digest'], session_id)
+
+        # Snapshot files no session points at are leftovers
+        for digest in [digest for digest, snapshot in self._snapshots.items() if not snapshot['refs']]:
+            self._drop_snapshot(digest)
+
+    def add(self, session_id, url, html, timestamp=None):
+        """Store a page for a session, sharing the snapshot with identical earlier pages"""
+        digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        with self._lock:
+            self._remove(session_id)
+            snapshot = self._snapshots.get(digest)
+            if snapshot is None:
+                snapshot = {'html': html, 'size': len(html), 'path': None, 'disk_size': 0, 'refs': 0}
+                self._snapshots[digest] = snapshot
+                self._memory_bytes += len(html)
+            else:
+                self.stats['deduplicated'] += 1
+                if snapshot['html'] is None:
+                    # We have the HTML in hand, no need to reload it later
+                    snapshot['html'] = html
+                    snapshot['size'] = len(html)
+                    self._memory_bytes += len(html)
+            snapshot['refs'] += 1
+            self._snapshots.move_to_end(digest)
+
+            previous = self._latest_by_url.get(url)
+            session = {
+                'url': url,
+                'timestamp': timestamp or datetime.now().isoformat(),
+                'digest': digest,
+                'last_access': time.time(),
+                'unchanged': previous is not None and previous[0] == digest,
+                'previous_session_id': previous[1] if previous else None
+            }
+            self._sessions[session_id] = session
+            self._latest_by_url[url] = (digest, session_id)
+            self._sweep()
+            victims = self._over_budget()
+
+        self._write_session(session_id, session)
+        self._spill(victims)
+        return session
+
+    def snapshot_info(self, session_id):
+        """Content hash and change signal recorded when a session was stored"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            return {
+                'content_hash': session['digest'],
+                'unchanged': session['unchanged'],
+                'previous_session_id': session['previous_session_id']
+            }
+
+    def session_url(self, session_id):
+        """URL a session was scraped from, or None for unknown sessions"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session['url'] if session else None
+
+    def latest(self, url, max_age):
+        """Session ID of the newest snapshot of `url` if it is at most `max_age` seconds old"""
+        with self._lock:
+            _, session_id = self._latest_by_url.get(url, (None, None))
+            session = self._sessions.get(session_id)
+            if session is None or self._expired(session):
+                return None
+            age = (datetime.now() - datetime.fromisoformat(session['timestamp'])).total_seconds()
+            return session_id if age <= max_age else None
+
+    def content_hash(self, session_id):
+        """SHA-256 of a session's HTML, or None for unknown sessions"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session['digest'] if session else None
+
+    def __contains__(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is not None and not self._expired(session)
+
+    def __getitem__(self, session_id):
+        record = self.get(session_id)
+        if record is None:
+            raise KeyError(session_id)
+        return record
+
+    def __setitem__(self, session_id, record):
+        self.add(session_id, record.get('url', ''), record['html'], record.get('timestamp'))
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            if session_id not in self._sessions:
+                raise KeyError(session_id)
+            self._remove(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id, default=None):
+        """Get {'url', 'html', 'timestamp'} for a session, reloading spilled HTML from disk"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return default
+            if self._expired(session):
+                self._remove(session_id)
+                self.stats['expired'] += 1
+                return default
+            session['last_access'] = time.time()
+            self._sessions.move_to_end(session_id)
+            digest = session['digest']
+            snapshot = self._snapshots[digest]
+            self._snapshots.move_to_end(digest)
+            html, path = snapshot['html'], snapshot['path']
+
+        if html is None:
+            try:
+                html = self._read(path)
+            except OSError as e:
+                print(f"Error reloading snapshot {digest}: {e}")
+                return default
+            with self._lock:
+                if self._snapshots.get(digest) is snapshot and snapshot['html'] is None:
+                    snapshot['html'] = html
+                    snapshot['size'] = len(html)
+                    self._memory_bytes += len(html)
+                    self.stats['reloads'] += 1
+                victims = self._over_budget(keep=digest)
+            self._spill(victims)
+
+        return {'url': session['url'], 'html': html, 'timestamp': session['timestamp']}
+
+    def status(self):
+        """Get store usage and counters"""
+        with self._lock:
+            in_memory = sum(1 for snapshot in self._snapshots.values() if snapshot['html'] is not None)
+            return {
+                'sessions': len(self._sessions),
+                'snapshots': len(self._snapshots),
+                'in_memory': in_memory,
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'codec': self.codec,
+                'stats': dict(self.stats)
+            }
+
+    def _expired(self, session):
+        return bool(self.ttl) and time.time() - session['last_access'] > self.ttl
+
+    def _sweep(self):
+        """Drop expired sessions, at most once a minute (lock held)"""
+        if not self.ttl or time.time() - self._last_sweep < 60:
+            return
+        self._last_sweep = time.time()
+        for session_id in [sid for sid, session in self._sessions.items() if self._expired(session)]:
+            self._remove(session_id)
+            self.stats['expired'] += 1
+
+    def _over_budget(self, keep=None):
+        """Pick least recently used in-memory snapshots to move out of RAM (lock held)"""
+        victims = []
+        memory = self._memory_bytes
+        for digest, snapshot in self._snapshots.items():
+            if memory <= self.max_memory_bytes:
+                break
+            if snapshot['html'] is None or digest == keep or snapshot.get('spilling'):
+                continue
+            snapshot['spilling'] = True
+            victims.append((digest, snapshot))
+            memory -= snapshot['size']
+        return victims
+
+    def _spill(self, victims):
+        """Write victim snapshots to disk (if not already there) and release their HTML"""
+        for digest, snapshot in victims:
+            path = snapshot['path']
+            if path is None:
+                try:
+                    path, disk_size = self._write_snapshot(digest, snapshot['html'])
+                except OSError as e:
+                    print(f"Error spilling snapshot {digest}: {e}")
+                    snapshot['spilling'] = False
+                    continue
+            with self._lock:
+                snapshot['spilling'] = False
+                if self._snapshots.get(digest) is not snapshot:
+                    # Every session using it was deleted while we were writing
+                    self._delete_file(path)
+                    continue
+                if snapshot['path'] is None:
+                    snapshot['path'] = path
+                    snapshot['disk_size'] = disk_size
+                    self._disk_bytes += disk_size
+                    self.stats['spills'] += 1
+                if snapshot['html'] is not None:
+                    snapshot['html'] = None
+                    self._memory_bytes -= snapshot['size']
+                self._trim_disk()
+
+    def _trim_disk(self):
+        """Forget the oldest spilled snapshots and their sessions past the disk budget (lock held)"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        for digest in list(self._snapshots):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            snapshot = self._snapshots[digest]
+            if snapshot['html'] is None and snapshot['path']:
+                for session_id in [sid for sid, session in self._sessions.items() if session['digest'] == digest]:
+                    self._remove(session_id)
+                self.stats['disk_evictions'] += 1
+
+    def _remove(self, session_id):
+        """Forget a session, dropping its snapshot once nothing references it (lock held)"""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        self._delete_file(os.path.join(self.directory, session_id + self.SESSION_SUFFIX))
+        if self._latest_by_url.get(session['url'], (None, None))[1] == session_id:
+            del self._latest_by_url[session['url']]
+        snapshot = self._snapshots.get(session['digest'])
+        if snapshot is not None:
+            snapshot['refs'] -= 1
+            if snapshot['refs'] <= 0:
+                self._drop_snapshot(session['digest'])
+
+    def _drop_snapshot(self, digest):
+        """Delete a snapshot from memory and disk (lock held)"""
+        snapshot = self._snapshots.pop(digest)
+        if snapshot['html'] is not None:
+            self._memory_bytes -= snapshot['size']
+        if snapshot['path']:
+            self._disk_bytes -= snapshot['disk_size']
+            self._delete_file(snapshot['path'])
+        document_cache.discard(digest)
+
+    def _write_session(self, session_id, session):
+        """Persist a session's metadata so it can be restored after a restart"""
+        path = os.path.join(self.directory, session_id + self.SESSION_SUFFIX)
+        try:
+            self._write_file(path, json.dumps(session).encode('utf-8'))
+        except OSError as e:
+            print(f"Error writing session {session_id}: {e}")
+
+    def _write_snapshot(self, digest, html):
+        """Compress a snapshot to disk; returns (path, compressed size)"""
+        data = html.encode('utf-8')
+        if self.codec == 'zstd':
+            path = os.path.join(self.directory, f'{digest}.html.zst')
+            data = zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            path = os.path.join(self.directory, f'{digest}.html.gz')
+            data = gzip.compress(data, compresslevel=5)
+        self._write_file(path, data)
+        return path, len(data)
+
+    def _write_file(self, path, data):
+        """Write through a temp file so a crash never leaves a truncated file under the real name"""
+        temp_path = f'{path}.{uuid.uuid4().hex[:8]}{self.TEMP_SUFFIX}'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            self._delete_file(temp_path)
+            raise
+
+    def _read(self, path):
+        """Load and decompress a spilled snapshot"""
+        return read_snapshot_file(path)
+
+    def snapshot_file(self, digest):
+        """Path of a snapshot's compressed file, writing it first if the snapshot is only in memory.
+
+        Lets extraction worker processes read pages themselves instead of having them pickled over.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(digest)
+            if snapshot is None or snapshot['path']:
+                return snapshot and snapshot['path']
+            html = snapshot['html']
+        try:
+            path, disk_size = self._write_snapshot(digest, html)
+        except OSError as e:
+            print(f"Error writing snapshot {digest}: {e}")
+            return None
+        with self._lock:
+            if self._snapshots.get(digest) is not snapshot:
+                self._delete_file(path)
+                return None
+            if snapshot['path'] is None:
+                snapshot['path'] = path
+                snapshot['disk_size'] = disk_size
+                self._disk_bytes += disk_size
+                # Still in memory, so this can only push out other snapshots
+                self._trim_disk()
+            return snapshot['path']
+
+    def _delete_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class DocumentCache:
+    """LRU cache of parsed documents keyed by content hash, bounded by an estimated memory budget.
+
+    Sessions with identical HTML share one parsed document.
+    """
+
+    def __init__(self, max_bytes, max_entries=64):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._docs = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, session_id):
+        """Get the parsed document for a session, parsing the stored HTML on a miss"""
+        digest = scraped_data_store.content_hash(session_id)
+        if digest is None:
+            return None
+        with self._lock:
+            if digest in self._docs:
+                self._docs.move_to_end(digest)
+                self.stats['hits'] += 1
+                return self._docs[digest][0]
+            self.stats['misses'] += 1
+
+        record = scraped_data_store.get(session_id)
+        if record is None:
+            return None
+        document = ParsedDocument(record['html'])
+        self.put(session_id, document)
+        return document
+
+    def put(self, session_id, document):
+        """Cache a parsed document, evicting least recently used ones to stay in budget"""
+        digest = scraped_data_store.content_hash(session_id)
+        cost = len(document.html) * DOM_COST_FACTOR
+        if digest is None or cost > self.max_bytes:
+            # Too big to keep; callers still get the tree they just parsed
+            return
+        with self._lock:
+            if digest in self._docs:
+                self._bytes -= self._docs.pop(digest)[1]
+            self._docs[digest] = (document, cost)
+            self._bytes += cost
+            while self._docs and (self._bytes > self.max_bytes or len(self._docs) > self.max_entries):
+                _, (_, evicted_cost) = self._docs.popitem(last=False)
+                self._bytes -= evicted_cost
+                self.stats['evictions'] += 1
+
+    def discard(self, digest):
+        """Drop the parsed document for a content hash"""
+        with self._lock:
+            if digest in self._docs:
+                self._bytes -= self._docs.pop(digest)[1]
+
+    def status(self):
+        """Get cache usage and counters"""
+        with self._lock:
+            return {
+                'entries': len(self._docs),
+                'estimated_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'stats': dict(self.stats)
+            }
+
+class EncodedBodyCache:
+    """LRU cache of compressed response bodies keyed by (ETag, encoding), bounded by size.
+
+    A page is compressed once per encoding however often its source is downloaded.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, build):
+        """Get a cached body, building and caching it on a miss"""
+        with self._lock:
+            if key in self._bodies:
+                self._bodies.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._bodies[key]
+            self.stats['misses'] += 1
+
+        body = build()
+        if len(body) > self.max_bytes:
+            return body
+        with self._lock:
+            if key not in self._bodies:
+                self._bodies[key] = body
+                self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats['evictions'] += 1
+        return body
+
+    def status(self):
+        """Get cache usage and counters"""
+        with self._lock:
+            return {
+                'entries': len(self._bodies),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'stats': dict(self.stats)
+            }
+
+# Ids and class names usable in a CSS selector without escaping
+CSS_IDENT_RE = re.compile(r'^-?[A-Za-z_][A-Za-z0-9_-]*$')
+# Ids and classes that look generated by a build step or CSS-in-JS library and change between deploys
+GENERATED_TOKEN_RE = re.compile(r'\d{4,}|^(?:css|sc|jsx|svelte|emotion)-|__[A-Za-z0-9_-]{5,}$')
+# Attributes whose values can identify an element, most stable first
+SELECTOR_ATTRIBUTES = ['data-testid', 'data-test', 'data-qa', 'name', 'for', 'aria-label', 'href', 'action',
+                       'alt', 'title', 'src', 'placeholder', 'type', 'role']
+# Longer attribute values make unreadable selectors and are usually volatile
+SELECTOR_VALUE_MAX = 120
+# data-* attributes holding a record's identity, e.g. data-id, data-product-id, data-sku
+DATA_ID_ATTRIBUTE_RE = re.compile(r'^data-(?:[a-z0-9_-]*-)?(?:id|key|sku|uid|uuid)$')
+
+def css_string(value):
+    """Quote a value for use in a CSS attribute selector"""
+    escaped = []
+    for char in value:
+        if char in '"\\':
+            escaped.append('\\' + char)
+        elif char < ' ' or char == '\x7f':
+            escaped.append(f'\\{ord(char):x} ')
+        else:
+            escaped.append(char)
+    return '"' + ''.join(escaped) + '"'
+
+def stable_token(value):
+    """Whether an id or class name can be used as-is and is unlikely to be generated"""
+    return bool(CSS_IDENT_RE.match(value)) and not GENERATED_TOKEN_RE.search(value)
+
+class PositionIndex:
+    """XPath and unique CSS selectors for every element of a tree, backed by one walk.
+
+    Sibling positions and id/tag/class/attribute frequencies are recorded up front. A selector is
+    only offered when those counts prove it matches exactly the elements it was built for, so no
+    query has to be run against the page, and a node's path is its parent's (memoized) path plus
+    one step instead of a scan of earlier siblings at every level.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # node -> (parent, XPath step, CSS step)
+        self.steps = {root: (None, root.tag, root.tag)}
+        self.ids = {}
+        self.tags = {}
+        self.tag_classes = {}
+        self.tag_attributes = {}
+        self._xpaths = {root: '/' + root.tag}
+        self._selectors = {}
+        # selector -> match count, for similar_selector
+        self._similar = {}
+        # (parent, tag, stable classes) -> (group step, member count, common classes)
+        self._groups = {}
+        # Elements with same-tag siblings, the only ones that can head a sibling group
+        self._repeated_tags = set()
+        self._classes = {}
+        # Elements in document order; a position here is the node ID used by the preview
+        self.elements = []
+
+        for parent in root.iter():
+            if not isinstance(parent.tag, str):
+                continue
+            self.elements.append(parent)
+            self._count(parent)
+            children = [child for child in parent if isinstance(child.tag, str)]
+            if not children:
+                continue
+            totals = {}
+            for child in children:
+                totals[child.tag] = totals.get(child.tag, 0) + 1
+            seen = {}
+            for position, child in enumerate(children, 1):
+                tag = child.tag
+                nth = seen[tag] = seen.get(tag, 0) + 1
+                several = totals[tag] > 1
+                if several:
+                    self._repeated_tags.add(child)
+                xpath_step = f'{tag}[{nth}]' if several else tag
+                if not SIMPLE_TAG_RE.match(tag):
+                    css_step = f'*:nth-child({position})'
+                else:
+                    css_step = f'{tag}:nth-of-type({nth})' if several else tag
+                self.steps[child] = (parent, xpath_step, css_step)
+
+    def _count(self, node):
+        """Record the id, tag and tag.class frequencies used to prove a selector unique"""
+        tag = node.tag
+        self.tags[tag] = self.tags.get(tag, 0) + 1
+        node_id = node.get('id')
+        if node_id:
+            self.ids[node_id] = self.ids.get(node_id, 0) + 1
+        for name in set(node.get('class', '').split()):
+            key = (tag, name)
+            self.tag_classes[key] = self.tag_classes.get(key, 0) + 1
+        for name in SELECTOR_ATTRIBUTES:
+            value = node.get(name)
+            if value:
+                key = (tag, name, value)
+                self.tag_attributes[key] = self.tag_attributes.get(key, 0) + 1
+
+    def xpath(self, node):
+        """Absolute XPath of a node, in the same form as lxml's getpath()"""
+        return self._build(node, self._xpaths, lambda current: None, '/', 1)
+
+    def css_selector(self, node):
+        """Shortest unique selector of the node itself, or its nearest such ancestor's plus child steps"""
+        return self._build(node, self._selectors, self._own_selector, ' > ', 2)
+
+    def similar_selector(self, node):
+        """Selector for the node and its counterparts in the other repeated items, and how many elements it matches.
+
+        For a title inside a listing card this is the card's parent, the card group step and the
+        path within the card, e.g. #content > div.product > h2.title, without the card's own id or
+        position. When nothing around the node repeats, its unique selector is returned with 1.
+        """
+        if node not in self.steps:
+            return None, 0
+        current = node
+        while True:
+            item, step, count = self.repeated_ancestor(current)
+            if item is None:
+                return self.css_selector(node), 1
+            path = []
+            inner = node
+            while inner is not item:
+                path.append(inner)
+                inner = self.steps[inner][0]
+            if not all(SIMPLE_TAG_RE.match(element.tag) for element in path):
+                return self.css_selector(node), 1
+
+            parent = self.steps[item][0]
+            prefix = f'{self.css_selector(parent)} > {step}'
+            if not path:
+                return prefix, count
+            # Stable classes keep the path specific; bare tags are tried when only this item has them
+            for steps in ([self._class_step(element) for element in reversed(path)],
+                          [(element.tag, ()) for element in reversed(path)]):
+                selector = prefix + ''.join(f' > {tag}' + ''.join(f'.{name}' for name in classes)
+                                            for tag, classes in steps)
+                count = self._match_count(selector, parent, [self._group_key(item)] + steps)
+                if count > 1:
+                    return selector, count
+            # Only this item has such a node: look for repetition further up
+            current = parent
+
+    def _class_step(self, node):
+        """(tag, stable classes) of a path step, e.g. h2.title"""
+        return node.tag, self._stable_classes(node)
+
+    def _stable_classes(self, node):
+        """A node's stable class names in source order, computed once per node"""
+        classes = self._classes.get(node)
+        if classes is None:
+            classes = self._classes[node] = tuple(name for name in dict.fromkeys(node.get('class', '').split())
+                                                  if stable_token(name))
+        return classes
+
+    def _match_count(self, selector, parent, steps):
+        """Number of elements `selector` matches, counted once per selector.
+
+        The selector is parent > step > step..., and the parent's selector is unique, so the
+        matches are found by following the steps down from the parent alone instead of querying
+        the whole tree.
+        """
+        if selector not in self._similar:
+            level = [parent]
+            for tag, classes in steps:
+                level = [child for node in level for child in node
+                         if child.tag == tag and set(classes).issubset(child.get('class', '').split())]
+            self._similar[selector] = len(level)
+        return self._similar[selector]
+
+    def _group_key(self, node):
+        """(tag, classes) of the sibling_group step of a repeated item"""
+        return node.tag, self._groups[(self.steps[node][0], node.tag, self._stable_classes(node))][2]
+
+    def sibling_group(self, node):
+        """Selector step for the node and the same-tag siblings sharing its most widespread stable
+        classes, e.g. div.product for one of a listing's cards, and how many siblings it matches"""
+        if node not in self._repeated_tags or not SIMPLE_TAG_RE.match(node.tag):
+            return None, 0
+        parent = self.steps[node][0]
+        classes = self._stable_classes(node)
+        key = (parent, node.tag, classes)
+        if key not in self._groups:
+            siblings = [set(child.get('class', '').split()) for child in parent if child.tag == node.tag]
+            counts = {name: sum(1 for names in siblings if name in names) for name in classes}
+            top = max(counts.values(), default=0)
+            common = [name for name in classes if counts[name] == top]
+            members = sum(1 for names in siblings if names.issuperset(common))
+            self._groups[key] = (node.tag + ''.join(f'.{name}' for name in common), members, tuple(common))
+        return self._groups[key][:2]
+
+    def repeated_ancestor(self, node):
+        """Nearest ancestor-or-self that repeats among its siblings, such as the card holding a title.
+
+        Returns (element, sibling_group step, group size), or (None, None, 0) when nothing repeats.
+        """
+        current = node
+        while current is not None and current in self.steps:
+            step, count = self.sibling_group(current)
+            if count > 1:
+                return current, step, count
+            current = self.steps[current][0]
+        return None, None, 0
+
+    def _own_selector(self, node):
+        """Shortest selector that matches only this node without help from its ancestors, if any.
+
+        Stable ids win outright; otherwise the shortest unique tag, tag.class or tag[attribute]
+        is used. Generated-looking ids and classes are skipped so selectors survive a redeploy.
+        """
+        tag = node.tag
+        node_id = node.get('id')
+        if node_id and self.ids.get(node_id) == 1 and not GENERATED_TOKEN_RE.search(node_id):
+            return f'#{node_id}' if CSS_IDENT_RE.match(node_id) else f'[id={css_string(node_id)}]'
+        if not SIMPLE_TAG_RE.match(tag):
+            return None
+        if self.tags.get(tag) == 1:
+            return tag
+
+        candidates = []
+        for name in node.get('class', '').split():
+            if stable_token(name) and self.tag_classes.get((tag, name)) == 1:
+                candidates.append(f'{tag}.{name}')
+        for name in SELECTOR_ATTRIBUTES:
+            value = node.get(name)
+            if value and len(value) <= SELECTOR_VALUE_MAX and self.tag_attributes.get((tag, name, value)) == 1:
+                candidates.append(f'{tag}[{name}={css_string(value)}]')
+        return min(candidates, key=len) if candidates else None
+
+    def _build(self, node, memo, own, separator, step_field):
+        """Join steps from the nearest memoized or self-identifying ancestor down to `node`"""
+        if node not in self.steps:
+            return None
+        pending = []
+        current = node
+        while current is not None and current not in memo:
+            value = own(current)
+            if value is not None:
+                memo[current] = value
+                break
+            pending.append(current)
+            current = self.steps[current][0]
+        prefix = memo.get(current, '') if current is not None else ''
+        for current in reversed(pending):
+            step = self.steps[current][step_field]
+            prefix = memo[current] = f'{prefix}{separator}{step}' if prefix else step
+        return memo[node]
+
+class ExtractionEngine:
+    """lxml-based rule engine running XPath and CSS natively, with compiled expressions cached across calls"""
+
+    # Attributes BeautifulSoup returns as lists; kept as lists so results match earlier versions
+    MULTI_VALUED_ATTRIBUTES = {'class', 'rel', 'rev', 'accept-charset', 'headers', 'accesskey', 'dropzone'}
+    INFO_ATTRIBUTES = ['id', 'class', 'name', 'href', 'src', 'alt', 'title']
+    # Same text as BeautifulSoup's get_text(): script/style/template content is not page text
+    TEXT_XPATH = etree.XPath(
+        'descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]',
+        smart_strings=False
+    )
+    CLASS_XPATH = etree.XPath(
+        "descendant-or-self::*[contains(concat(' ', normalize-space(@class), ' '), $needle)]"
+    )
+    CLASS_EXACT_XPATH = etree.XPath("descendant-or-self::*[normalize-space(@class) = $value]")
+    ID_XPATH = etree.XPath("(descendant-or-self::*[@id = $value])[1]")
+
+    def __init__(self, max_compiled=1024):
+        self.max_compiled = max_compiled
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self._translator = HTMLTranslator()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _cached(self, key, build):
+        """Get a compiled object from the LRU cache, building it on a miss"""
+        with self._lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._compiled[key]
+            self.stats['misses'] += 1
+
+        compiled = build()
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_compiled:
+                self._compiled.popitem(last=False)
+                self.stats['evictions'] += 1
+        return compiled
+
+    def compile(self, selector_type, selector):
+        """Get a callable returning the nodes matched by a selector in a tree"""
+        return self._cached(('selector', selector_type, selector),
+                            lambda: self._build_matcher(selector_type, selector))
+
+    def compile_regex(self, pattern):
+        """Get a compiled regular expression"""
+        return self._cached(('regex', pattern), lambda: re.compile(pattern))
+
+    def compile_rule(self, rule):
+        """Get the CompiledRule for a rule dict; equal rules share one compiled object"""
+        key = ('rule', rule.get('name', 'unnamed'), rule.get('selector_type', 'css'), rule.get('selector', ''),
+               rule.get('attribute', 'text'), rule.get('regex') or '')
+        return self._cached(key, lambda: CompiledRule(rule, self))
+
+    def _build_matcher(self, selector_type, selector):
+        """Compile a selector into a callable"""
+        if selector_type == 'xpath':
+            return etree.XPath(selector, smart_strings=False)
+        if selector_type in ('css', 'tag'):
+            return etree.XPath(self._translator.css_to_xpath(selector), smart_strings=False)
+        if selector_type == 'class':
+            # BeautifulSoup matches a single class token, or the whole attribute when spaces are given
+            if ' ' in selector.strip():
+                value = ' '.join(selector.split())
+                return lambda tree: self.CLASS_EXACT_XPATH(tree, value=value)
+            needle = f' {selector.strip()} '
+            return lambda tree: self.CLASS_XPATH(tree, needle=needle)
+        if selector_type == 'id':
+            return lambda tree: self.ID_XPATH(tree, value=selector)
+        return lambda tree: []
+
+    def browser_xpath(self, selector_type, selector):
+        """XPath 1.0 expression matching what _build_matcher matches, for document.evaluate in a browser.
+
+        Returns None for selector types that match nothing.
+        """
+        if selector_type == 'xpath':
+            return selector
+        if selector_type in ('css', 'tag'):
+            return self._translator.css_to_xpath(selector)
+        if selector_type == 'class':
+            if ' ' in selector.strip():
+                value = self._translator.xpath_literal(' '.join(selector.split()))
+                return f"descendant-or-self::*[normalize-space(@class) = {value}]"
+            needle = self._translator.xpath_literal(f' {selector.strip()} ')
+            return f"descendant-or-self::*[contains(concat(' ', normalize-space(@class), ' '), {needle})]"
+        if selector_type == 'id':
+            return f"(descendant-or-self::*[@id = {self._translator.xpath_literal(selector)}])[1]"
+        return None
+
+    def extract_many(self, tree, rules):
+        """Run several rules, matching all tag/class/id rules in a single walk of the tree.
+
+        Returns one result list per rule, identical to calling extract() for each.
+        """
+        results = [None] * len(rules)
+        walk_rules = []
+        for i, rule in enumerate(rules):
+            try:
+                compiled = rule if isinstance(rule, CompiledRule) else self.compile_rule(rule)
+            except (etree.XPathError, SelectorError, re.error, ValueError) as e:
+                print(f"Extraction error: {e}")
+                results[i] = []
+                continue
+            if compiled.walk_key:
+                walk_rules.append((i, compiled))
+            else:
+                results[i] = self.extract(tree, compiled)
+
+        if len(walk_rules) < BATCH_WALK_MIN_RULES:
+            # A shared walk only pays off once it replaces a few separate traversals
+            for i, compiled in walk_rules:
+                results[i] = self.extract(tree, compiled)
+        elif walk_rules:
+            matched = self._walk(tree, [compiled.walk_key for _, compiled in walk_rules])
+            # Rules that differ only by name share one computed result
+            computed = {}
+            for (i, compiled), nodes in zip(walk_rules, matched):
+                key = (compiled.walk_key, compiled.attribute, compiled.regex)
+                if key not in computed:
+                    computed[key] = self.values(nodes, compiled.attribute, compiled.pattern)
+                results[i] = list(computed[key])
+        return results
+
+    def _walk(self, tree, walk_keys):
+        """Collect the nodes for each walk key in one traversal of the tree"""
+        unique_keys = sorted(set(walk_keys))
+        by_tag, by_class, by_class_exact, by_id = {}, {}, {}, {}
+        index = {'tag': by_tag, 'class': by_class, 'class_exact': by_class_exact, 'id': by_id}
+        nodes_by_key = {key: [] for key in unique_keys}
+        for key in unique_keys:
+            index[key[0]][key[1]] = nodes_by_key[key]
+
+        check_class = bool(by_class or by_class_exact)
+        if check_class or by_id:
+            # libxml2 prefilters on cheap tag/attribute-presence tests; exact matching happens here
+            prefilter = self._cached(('walk',) + tuple(unique_keys), lambda: self._build_walk_xpath(unique_keys))
+            candidates = prefilter(tree)
+        else:
+            candidates = tree.iter(*by_tag)
+
+        for node in candidates:
+            nodes = by_tag.get(node.tag)
+            if nodes is not None:
+                nodes.append(node)
+            if check_class:
+                value = node.get('class')
+                if value:
+                    tokens = value.split()
+                    for token in dict.fromkeys(tokens):
+                        nodes = by_class.get(token)
+                        if nodes is not None:
+                            nodes.append(node)
+                    if by_class_exact:
+                        nodes = by_class_exact.get(' '.join(tokens))
+                        if nodes is not None:
+                            nodes.append(node)
+            if by_id:
+                nodes = by_id.get(node.get('id'))
+                # Like find(id=...), only the first element with an ID counts
+                if nodes is not None and not nodes:
+                    nodes.append(node)
+
+        return [nodes_by_key[key] for key in walk_keys]
+
+    def _build_walk_xpath(self, walk_keys):
+        """Build one XPath selecting every element that could satisfy a walk key"""
+        conditions = [f'self::{value}' for kind, value in walk_keys if kind == 'tag']
+        if any(kind in ('class', 'class_exact') for kind, _ in walk_keys):
+            conditions.append('@class')
+        if any(kind == 'id' for kind, _ in walk_keys):
+            conditions.append('@id')
+        return etree.XPath(f"descendant-or-self::*[{' or '.join(conditions)}]")
+
+    def status(self):
+        """Get compiled cache usage and counters"""
+        with self._lock:
+            return {'entries': len(self._compiled), 'max_entries': self.max_compiled, 'stats': dict(self.stats)}
+
+    def extract(self, tree, rule):
+        """Extract data from an lxml tree based on an extraction rule (dict or CompiledRule)"""
+        try:
+            compiled = rule if isinstance(rule, CompiledRule) else self.compile_rule(rule)
+            return compiled.extract(tree)
+        except (etree.XPathError, SelectorError, re.error, ValueError) as e:
+            print(f"Extraction error: {e}")
+            return []
+
+    def values(self, nodes, attribute, pattern=None):
+        """Turn matched nodes into result values for the requested attribute"""
+        if not isinstance(nodes, list):
+            # XPath expressions such as count(...) return a single value
+            nodes = [nodes]
+
+        results = []
+        positions = None
+        for node in nodes:
+            if isinstance(node, str):
+                # XPath text() and @attr results are already values
+                value = str(node)
+            elif not isinstance(node, etree._Element) or not isinstance(node.tag, str):
+                if isinstance(node, (int, float, bool)):
+                    results.append(node)
+                continue
+            elif attribute == 'text':
+                value = self.text(node)
+            elif attribute == 'html':
+                value = etree.tostring(node, encoding='unicode', method='html', with_tail=False)
+            elif attribute == 'all':
+                if positions is None:
+                    positions = self.positions(node)
+                results.append(self.element_info(node, positions))
+                continue
+            else:
+                value = self.attribute(node, attribute)
+
+            if pattern is not None and isinstance(value, str):
+                match = pattern.search(value)
+                if not match:
+                    continue
+                value = match.group(1) if pattern.groups else match.group(0)
+            results.append(value)
+        return results
+
+    def text(self, node):
+        """Stripped text of a node, joined like BeautifulSoup's get_text(strip=True)"""
+        return ''.join(part.strip() for part in self.TEXT_XPATH(node))
+
+    def attribute(self, node, name):
+        """Attribute value, split into a list for multi-valued attributes"""
+        value = node.get(name)
+        if value is None:
+            return ''
+        if name in self.MULTI_VALUED_ATTRIBUTES:
+            return value.split()
+        return value
+
+    def positions(self, node):
+        """PositionIndex for the tree holding `node`; shared through its ParsedDocument when it has one"""
+        root = node.getroottree().getroot()
+        document = ParsedDocument.owner(root)
+        return document.positions if document is not None else PositionIndex(root)
+
+    def element_info(self, node, positions=None):
+        """Get detailed information about an lxml element"""
+        positions = positions or self.positions(node)
+        text = self.text(node)
         info = {
-            'tag': element.name,
-            'text': element.get_text(strip=True)[:200] if element.get_text(strip=True) else '',
+            'tag': node.tag,
+            'text': text[:200],
             'attributes': {},
-            'css_selector': self._get_css_selector(element),
-            'xpath': self._get_xpath(element)
+            'css_selector': positions.css_selector(node),
+            'xpath': positions.xpath(node)
+        }
+        for attr in self.INFO_ATTRIBUTES:
+            value = node.get(attr)
+            if value:
+                info['attributes'][attr] = ' '.join(value.split()) if attr == 'class' else value
+        for key, value in node.attrib.items():
+            if key.startswith('data-'):
+                info['attributes'][key] = value
+        return info
+
+# Fewest tag/class/id rules for which extract_many uses one shared walk
+BATCH_WALK_MIN_RULES = 3
+# Tag names that can be matched during a combined walk
+SIMPLE_TAG_RE = re.compile(r'^[A-Za-z][A-Za-z0-9-]*$')
+
+class CompiledRule:
+    """Extraction rule whose selector and optional regex are compiled once and reused"""
+
+    def __init__(self, rule, engine):
+        self.name = rule.get('name', 'unnamed')
+        self.selector_type = rule.get('selector_type', 'css')
+        self.selector = rule.get('selector', '')
+        self.attribute = rule.get('attribute', 'text')
+        self.regex = rule.get('regex') or None
+        self.engine = engine
+        self.matcher = engine.compile(self.selector_type, self.selector)
+        self.pattern = engine.compile_regex(self.regex) if self.regex else None
+        self.walk_key = self._walk_key()
+
+    def _walk_key(self):
+        """Key used by ExtractionEngine.extract_many to match this rule in a shared walk"""
+        selector = self.selector.strip()
+        if self.selector_type == 'tag' and SIMPLE_TAG_RE.match(selector):
+            return ('tag', selector.lower())
+        if self.selector_type == 'class' and selector:
+            if ' ' in selector:
+                return ('class_exact', ' '.join(selector.split()))
+            return ('class', selector)
+        if self.selector_type == 'id' and self.selector:
+            return ('id', self.selector)
+        return None
+
+    def extract(self, tree):
+        """Run the rule against an lxml tree"""
+        return self.engine.values(self.matcher(tree), self.attribute, self.pattern)
+
+    def as_dict(self):
+        """Plain rule dict, e.g. to send the rule to another process"""
+        return {'name': self.name, 'selector_type': self.selector_type, 'selector': self.selector,
+                'attribute': self.attribute, 'regex': self.regex}
+
+
+def extract_keyed(document, rules):
+    """Rule results keyed by a stable identity per item: {rule name: {key: value}}.
+
+    Element results are keyed by item_key, so an item keeps its key when others are inserted or
+    removed around it. Text and attribute strings from XPath are keyed by their value, and only
+    scalar results such as count(...) fall back to their position.
+    """
+    positions = document.positions
+    results = {}
+    for rule in rules:
+        try:
+            compiled = rule if isinstance(rule, CompiledRule) else extraction_engine.compile_rule(rule)
+        except (etree.XPathError, SelectorError, re.error, ValueError) as e:
+            print(f"Extraction error: {e}")
+            results[rule_name(rule)] = {}
+            continue
+        keyed = {}
+        try:
+            nodes = compiled.matcher(document.tree)
+        except (etree.XPathError, SelectorError) as e:
+            print(f"Extraction error: {e}")
+            nodes = []
+        if not isinstance(nodes, list):
+            nodes = [nodes]
+        for position, node in enumerate(nodes):
+            values = extraction_engine.values([node], compiled.attribute, compiled.pattern)
+            if not values:
+                continue
+            if isinstance(node, etree._Element):
+                key = item_key(node, positions)
+            elif isinstance(node, str):
+                key = 'text:' + hashlib.sha1(node.encode('utf-8')).hexdigest()[:16]
+            else:
+                key = f'#{position}'
+            # Identical items get ~2, ~3... in document order
+            unique, copy_number = key, 1
+            while unique in keyed:
+                copy_number += 1
+                unique = f'{key}~{copy_number}'
+            keyed[unique] = values[0]
+        results[compiled.name] = keyed
+    return results
+
+def item_key(node, positions):
+    """Identity of an element that does not depend on where its item sits in the page.
+
+    The item is the node's nearest repeated ancestor-or-self (a card, row or list entry). It is
+    identified by a stable id, a data-* id, a link, or else a hash of its markup; a node inside
+    the item adds its path within the item.
+    """
+    node_id = node.get('id')
+    if node_id and stable_token(node_id) and positions.ids.get(node_id) == 1:
+        return f'#{node_id}'
+    item = positions.repeated_ancestor(node)[0]
+    if item is None:
+        item = node
+
+    anchor = None
+    for holder in dict.fromkeys((node, item)):
+        holder_id = holder.get('id')
+        if holder_id and stable_token(holder_id) and positions.ids.get(holder_id) == 1:
+            anchor = f'#{holder_id}'
+        else:
+            for name, value in holder.attrib.items():
+                if value and DATA_ID_ATTRIBUTE_RE.match(name):
+                    anchor = f'{holder.tag}[{name}={css_string(value)}]'
+                    break
+        if anchor:
+            return anchor if holder is node else anchor + item_path(node, item, positions)
+
+    links = [node] if node.get('href') else item.xpath('descendant-or-self::*[@href][1]')
+    if links:
+        anchor = f"href={links[0].get('href')}"
+    else:
+        markup = etree.tostring(item, encoding='unicode', method='html', with_tail=False)
+        anchor = 'sha:' + hashlib.sha1(markup.encode('utf-8')).hexdigest()[:16]
+    return anchor + item_path(node, item, positions)
+
+def item_path(node, item, positions):
+    """CSS child steps from an item down to a node inside it; empty for the item itself"""
+    steps = []
+    while node is not item:
+        parent, _, css_step = positions.steps[node]
+        steps.append(css_step)
+        node = parent
+    return ''.join(f' > {step}' for step in reversed(steps))
+
+def diff_keyed(old, new):
+    """Added, removed and changed items per rule between two extract_keyed results"""
+    diff = {}
+    for name, items in new.items():
+        previous = old.get(name, {})
+        rule_diff = {'added': {}, 'removed': {}, 'changed': {}, 'unchanged': 0}
+        for key, value in items.items():
+            if key not in previous:
+                rule_diff['added'][key] = value
+            elif previous[key] != value:
+                rule_diff['changed'][key] = {'old': previous[key], 'new': value}
+            else:
+                rule_diff['unchanged'] += 1
+        for key, value in previous.items():
+            if key not in items:
+                rule_diff['removed'][key] = value
+        diff[name] = rule_diff
+    return diff
+
+
+class DiffBaselines:
+    """Last keyed results per (URL, rule set), the reference for batch_extract's diff mode"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._baselines = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def rule_set_key(rules):
+        """Hash identifying a rule set independently of rule order; every rule must compile"""
+        dicts = [rule.as_dict() if isinstance(rule, CompiledRule) else extraction_engine.compile_rule(rule).as_dict()
+                 for rule in rules]
+        encoded = json.dumps(sorted(dicts, key=lambda rule: json.dumps(rule, sort_keys=True)), sort_keys=True)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, url, rule_set):
+        """Baseline {'session_id', 'content_hash', 'timestamp', 'results'} or None"""
+        with self._lock:
+            baseline = self._baselines.get((url, rule_set))
+            if baseline is not None:
+                self._baselines.move_to_end((url, rule_set))
+            return baseline
+
+    def put(self, url, rule_set, baseline):
+        """Make `baseline` the reference for the next diff of this URL and rule set"""
+        with self._lock:
+            self._baselines[(url, rule_set)] = baseline
+            self._baselines.move_to_end((url, rule_set))
+            while len(self._baselines) > self.max_entries:
+                self._baselines.popitem(last=False)
+
+    def status(self):
+        """Get baseline count"""
+        with self._lock:
+            return {'entries': len(self._baselines), 'max_entries': self.max_entries}
+
+
+def extract_snapshot_files(snapshots, rules):
+    """Process-pool task: apply rule dicts to (digest, path) snapshot files.
+
+    Returns [(digest, results, error)]; each worker process compiles rules once through its
+    own extraction_engine and reads the pages from disk itself.
+    """
+    compiled = [extraction_engine.compile_rule(rule) for rule in rules]
+    output = []
+    for digest, path in snapshots:
+        try:
+            tree = ParsedDocument(read_snapshot_file(path)).tree
+        except Exception as e:
+            output.append((digest, None, f"Could not read snapshot: {e}"))
+            continue
+        extracted = extraction_engine.extract_many(tree, compiled)
+        output.append((digest, {rule.name: values for rule, values in zip(compiled, extracted)}, None))
+    return output
+
+
+class ParallelExtractor:
+    """Process pool applying rule sets to stored snapshots on every CPU core"""
+
+    def __init__(self, workers=None, chunk_size=16):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that runs Flask, driver and event-loop threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def run(self, snapshots, rules):
+        """Apply rule dicts to (digest, path) pairs, yielding (digest, results, error) as chunks finish"""
+        # Small chunks keep every worker busy; larger ones cut per-task overhead on big batches
+        size = max(1, min(self.chunk_size, len(snapshots) // (self.workers * 4)))
+        executor = self._executor()
+        futures = {}
+        for start in range(0, len(snapshots), size):
+            chunk = snapshots[start:start + size]
+            futures[executor.submit(extract_snapshot_files, chunk, rules)] = chunk
+
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    for digest, _ in futures[future]:
+                        yield digest, None, f"Extraction worker failed: {e}"
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+# Visual selector inventory categories, in display order
+ELEMENT_CATEGORIES = ('headings', 'links', 'images', 'paragraphs', 'divs', 'spans',
+                      'tables', 'lists', 'forms', 'buttons', 'inputs')
+INVENTORY_TAG_CATEGORIES = {
+    'h1': 'headings', 'h2': 'headings', 'h3': 'headings', 'h4': 'headings', 'h5': 'headings', 'h6': 'headings',
+    'a': 'links', 'img': 'images', 'p': 'paragraphs', 'table': 'tables', 'ul': 'lists', 'ol': 'lists',
+    'form': 'forms', 'button': 'buttons', 'input': 'inputs'
+}
+ELEMENTS_PAGE_SIZE = 100
+
+class ElementInventory:
+    """Elements of a page grouped by category, collected in a single walk of the tree.
+
+    Only node references (plus counts that need the walk) are kept; text and selectors are
+    built when a page of a category is requested.
+    """
+
+    def __init__(self, tree):
+        self.root = tree
+        self.entries = {category: [] for category in ELEMENT_CATEGORIES}
+        seen = {category: 0 for category in ELEMENT_CATEGORIES}
+        open_tables = []
+        open_lists = []
+
+        for event, node in etree.iterwalk(tree, events=('start', 'end')):
+            tag = node.tag
+            if not isinstance(tag, str):
+                continue
+            if event == 'end':
+                if tag == 'table':
+                    open_tables.pop()
+                elif tag in ('ul', 'ol'):
+                    open_lists.pop()
+                continue
+
+            # Rows and items count toward every enclosing table or list, like find_all would
+            if tag == 'tr':
+                for counter in open_tables:
+                    counter[0] += 1
+            elif tag == 'li':
+                for counter in open_lists:
+                    counter[0] += 1
+
+            category = INVENTORY_TAG_CATEGORIES.get(tag)
+            if category is None:
+                continue
+            index = seen[category]
+            seen[category] += 1
+
+            if category == 'links':
+                if node.get('href') is None:
+                    seen[category] -= 1
+                    continue
+                self.entries[category].append((index, node, None))
+            elif category == 'paragraphs':
+                # Empty paragraphs keep their place in the numbering but are not listed
+                text = extraction_engine.text(node)
+                if text:
+                    self.entries[category].append((index, node, text))
+            elif category == 'tables':
+                counter = [0]
+                open_tables.append(counter)
+                self.entries[category].append((index, node, counter))
+            elif category == 'lists':
+                counter = [0]
+                open_lists.append(counter)
+                self.entries[category].append((index, node, counter))
+            else:
+                self.entries[category].append((index, node, None))
+
+    def counts(self):
+        """Number of listed elements per category"""
+        return {category: len(entries) for category, entries in self.entries.items()}
+
+    def page(self, category, offset=0, limit=None):
+        """Describe a slice of one category's elements"""
+        entries = self.entries[category]
+        end = len(entries) if limit is None else offset + limit
+        positions = extraction_engine.positions(self.root)
+        return [self._describe(category, index, node, extra, positions) for index, node, extra in entries[offset:end]]
+
+    def _describe(self, category, index, node, extra, positions):
+        engine = extraction_engine
+        similar, similar_count = positions.similar_selector(node)
+        item = {'index': index, 'selector': positions.css_selector(node),
+                'similar_selector': similar, 'similar_count': similar_count}
+        if category == 'headings':
+            item.update(tag=node.tag, text=engine.text(node)[:100])
+        elif category == 'links':
+            item.update(text=engine.text(node)[:50], href=node.get('href'))
+        elif category == 'images':
+            item.update(src=node.get('src', ''), alt=node.get('alt', ''))
+        elif category == 'paragraphs':
+            item.update(text=extra[:150])
+        elif category == 'tables':
+            item.update(rows=extra[0])
+        elif category == 'lists':
+            item.update(tag=node.tag, items=extra[0])
+        elif category == 'forms':
+            item.update(action=node.get('action', ''))
+        elif category == 'buttons':
+            item.update(text=engine.text(node) or node.get('value', ''))
+        elif category == 'inputs':
+            item.update(type=node.get('type', 'text'), name=node.get('name', ''),
+                        placeholder=node.get('placeholder', ''))
+        item['id'] = node.get('id', '')
+        item['class'] = ' '.join(node.get('class', '').split())
+        return item
+
+
+class DomainThrottle:
+    """Spaces out requests to the same domain across all crawl jobs"""
+
+    def __init__(self):
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url, delay):
+        """Block until the URL's domain may be requested again, reserving the slot"""
+        if delay <= 0:
+            return
+        domain = urlparse(url).netloc
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.get(domain, 0))
+            self._next_slot[domain] = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CrawlJob:
+    """Background crawl of many URLs with one rule set"""
+
+    def __init__(self, urls, rules, mode=DEFAULT_FETCH_MODE, concurrency=4, delay=JOB_DOMAIN_DELAY,
+                 retries=2, retry_backoff=1.0, store_pages=False, wait_options=None):
+        self.id = str(uuid.uuid4())
+        self.urls = urls
+        self.rules = rules
+        self.mode = mode
+        self.concurrency = max(1, min(concurrency, JOB_MAX_CONCURRENCY))
+        self.delay = delay
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.store_pages = store_pages
+        self.wait_options = wait_options or {}
+        self.status = 'queued'
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.results = []
+        self.succeeded = 0
+        self.failed = 0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Crawl every URL with up to `concurrency` workers"""
+        self.status = 'running'
+        self.started_at = datetime.now().isoformat()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f'job-{self.id[:8]}') as executor:
+            for url in self.urls:
+                executor.submit(self._crawl_url, url)
+        self.status = 'cancelled' if self._cancelled.is_set() else 'completed'
+        self.finished_at = datetime.now().isoformat()
+
+    def cancel(self):
+        """Skip URLs that have not started yet"""
+        self._cancelled.set()
+
+    def _crawl_url(self, url):
+        """Fetch one URL with retries and record its result; any failure is recorded as a failed result"""
+        if self._cancelled.is_set():
+            return
+        result = {'url': url, 'success': False, 'attempts': 0, 'error': None}
+        try:
+            if not self._fetch_and_extract(url, result):
+                return
+        except Exception as e:
+            print(f"Crawl error for {url}: {e}")
+            result.update({'success': False, 'error': str(e)})
+            result.pop('results', None)
+
+        with self._lock:
+            self.results.append(result)
+            if result['success']:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def _fetch_and_extract(self, url, result):
+        """Fill in `result` for one URL; returns False when the job was cancelled before it finished"""
+        for attempt in range(self.retries + 1):
+            if self._cancelled.is_set():
+                return False
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            result['attempts'] = attempt + 1
+            domain_throttle.wait(url, self.delay)
+            try:
+                html, error, fetch_info = fetch_page(url, self.mode, self.rules, **self.wait_options)
+            except Exception as e:
+                html, error, fetch_info = None, str(e), None
+            if not error:
+                break
+            result['error'] = error
+            # Client errors other than rate limiting won't change on retry
+            if error.startswith('HTTP 4') and error != 'HTTP 429':
+                break
+
+        if not error:
+            document = fetch_info['document'] or ParsedDocument(html)
+            extracted = extraction_engine.extract_many(document.tree, self.rules)
+            result.update({
+                'success': True,
+                'error': None,
+                'fetched_with': fetch_info['fetched_with'],
+                'results': {rule_name(rule): values for rule, values in zip(self.rules, extracted)}
+            })
+            if self.store_pages:
+                result['session_id'] = store_session(url, html, document)
+                result['unchanged'] = scraped_data_store.snapshot_info(result['session_id'])['unchanged']
+        return True
+
+    def summary(self):
+        """Get job status and progress"""
+        done = self.succeeded + self.failed
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'mode': self.mode,
+            'total': len(self.urls),
+            'done': done,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'progress': round(done / len(self.urls) * 100, 1) if self.urls else 100.0,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
         }
-        
-        # Get important attributes
-        for attr in ['id', 'class', 'name', 'href', 'src', 'alt', 'title', 'data-*']:
-            if attr == 'class':
-                classes = element.get('class', [])
-                if classes:
-                    info['attributes']['class'] = ' '.join(classes)
-            elif attr == 'data-*':
-                for key in element.attrs:
-                    if key.startswith('data-'):
-                        info['attributes'][key] = element[key]
-            elif element.get(attr):
-                info['attributes'][attr] = element[attr]
-        
-        return info
-    
-    def _get_css_selector(self, element):
-        """Generate CSS selector for element"""
-        selector = element.name
-        if element.get('id'):
-            selector += f"#{element['id']}"
-        elif element.get('class'):
-            classes = '.'.join(element.get('class', []))
-            selector += f".{classes}"
-        return selector
-    
-    def _get_xpath(self, element):
-        """Generate XPath for element"""
-        parts = []
-        current = element
-        while current and current.name != '[document]':
-            index = 1
-            for sibling in current.previous_siblings:
-                if sibling.name == current.name:
-                    index += 1
-            parts.insert(0, f"{current.name}[{index}]")
-            current = current.parent
-        return '/' + '/'.join(parts)
-    
-    def extract_by_rule(self, rule):
-        """Extract data based on extraction rule"""
-        if not self.soup:
-            return []
-        
-        results = []
-        selector_type = rule.get('selector_type', 'css')
-        selector = rule.get('selector', '')
-        attribute = rule.get('attribute', 'text')
-        
+
+    def results_page(self, offset=0, limit=100):
+        """Get a slice of results in completion order"""
+        with self._lock:
+            return self.results[offset:offset + limit]
+
+
+class PaginatedCrawl:
+    """Walk a paginated or infinite-scroll listing, yielding only the items each step adds.
+
+    'template' fetches {page} URLs one after another. 'next' and 'scroll' keep one browser
+    page open and follow a next link/button or scroll to the bottom. There, rules are matched
+    in the browser and only nodes not reported at an earlier step are sent back and parsed,
+    so the growing page is never serialized or parsed as a whole. With dedupe on, values
+    already yielded for a rule are dropped, which catches items repeated across pages.
+    """
+
+    # SeleniumScraper.open_page arguments among the parsed fetch options
+    PAGE_OPTIONS = ('wait_time', 'wait_strategy', 'max_wait', 'idle_ms', 'wait_for', 'resource_policy')
+
+    def __init__(self, rules, pagination='next', url=None, next_selector=None, url_template=None,
+                 start_page=1, page_step=1, max_pages=PAGINATE_MAX_PAGES, dedupe=True,
+                 mode=DEFAULT_FETCH_MODE, delay=JOB_DOMAIN_DELAY, wait_options=None):
+        self.rules = [rule if isinstance(rule, CompiledRule) else extraction_engine.compile_rule(rule)
+                      for rule in rules]
+        self.pagination = pagination
+        self.url = url
+        self.next_selector = next_selector
+        self.url_template = url_template
+        self.start_page = start_page
+        self.page_step = page_step or 1
+        self.max_pages = max_pages
+        self.dedupe = dedupe
+        self.mode = mode
+        self.delay = delay
+        self.wait_options = wait_options or {}
+        self.seen = [set() for _ in self.rules]
+        self.steps = 0
+        self.items = 0
+        self.error = None
+
+    def run(self):
+        """Yield one dict per step, then a summary saying why the crawl stopped"""
+        started = time.time()
         try:
-            if selector_type == 'css':
-                elements = self.soup.select(selector)
-            elif selector_type == 'xpath':
-                # For XPath, we'd need lxml, fallback to CSS
-                elements = self.soup.select(selector)
-            elif selector_type == 'tag':
-                elements = self.soup.find_all(selector)
-            elif selector_type == 'class':
-                elements = self.soup.find_all(class_=selector)
-            elif selector_type == 'id':
-                element = self.soup.find(id=selector)
-                elements = [element] if element else []
+            if self.pagination == 'template':
+                stopped = yield from self._template_steps()
             else:
-                elements = []
-            
-            for elem in elements:
-                if elem:
-                    if attribute == 'text':
-                        results.append(elem.get_text(strip=True))
-                    elif attribute == 'html':
-                        results.append(str(elem))
-                    elif attribute == 'all':
-                        results.append(self.get_element_info(elem))
-                    else:
-                        results.append(elem.get(attribute, ''))
+                stopped = yield from self._browser_steps()
         except Exception as e:
-            print(f"Extraction error: {e}")
-        
-        return results
-    
-    def close(self):
-        """Close the WebDriver"""
-        if self.driver:
-            self.driver.quit()
-            self.driver = None
+            stopped, self.error = 'error', str(e)
+        yield {
+            'done': True,
+            'steps': self.steps,
+            'items': self.items,
+            'stopped': stopped,
+            'error': self.error,
+            'elapsed': round(time.time() - started, 3)
+        }
+
+    def _step(self, url, extracted):
+        """Step result holding the values not yielded at earlier steps"""
+        self.steps += 1
+        results, new, duplicates = {}, 0, 0
+        for rule, seen, values in zip(self.rules, self.seen, extracted):
+            if self.dedupe:
+                fresh = []
+                for value in values:
+                    key = json.dumps(value, sort_keys=True, default=str)
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                    fresh.append(value)
+                values = fresh
+            results[rule.name] = values
+            new += len(values)
+        self.items += new
+        return {'step': self.steps, 'url': url, 'new': new, 'duplicates': duplicates, 'results': results}
+
+    def _template_steps(self):
+        """Fetch template pages in order until one fails or adds nothing; returns the stop reason"""
+        wait_options = dict(self.wait_options)
+        use_cache = wait_options.pop('use_cache', True)
+        backend = wait_options.pop('backend', DEFAULT_BACKEND)
+        page = self.start_page
+        while True:
+            url = self.url_template.replace('{page}', str(page))
+            domain_throttle.wait(url, self.delay)
+            html, error, info = fetch_page(url, self.mode, self.rules, use_cache, backend, **wait_options)
+            if error:
+                if self.steps and error in ('HTTP 404', 'HTTP 410'):
+                    return 'no_more_pages'
+                self.error = f'{url}: {error}'
+                return 'error'
+            document = info['document'] or ParsedDocument(html)
+            step = self._step(url, extraction_engine.extract_many(document.tree, self.rules))
+            yield step
+            if self.steps >= self.max_pages:
+                return 'max_pages'
+            if not step['new']:
+                return 'no_new_items'
+            page += self.page_step
+
+    def _browser_steps(self):
+        """Page through one browser tab with the next selector or by scrolling; returns the stop reason"""
+        options = {key: self.wait_options[key] for key in self.PAGE_OPTIONS if key in self.wait_options}
+        if options.get('resource_policy') == 'auto':
+            options['resource_policy'] = resource_policy_for(self.rules)
+        navigation = {key: options[key] for key in ('wait_strategy', 'max_wait', 'idle_ms', 'wait_time')
+                      if key in options}
+        xpaths = [(i, extraction_engine.browser_xpath(rule.selector_type, rule.selector))
+                  for i, rule in enumerate(self.rules)]
+        xpaths = [(i, xpath) for i, xpath in xpaths if xpath]
+
+        with driver_pool.session() as worker:
+            error = worker.open_page(self.url, **options)
+            if error:
+                self.error = error
+                return 'error'
+            visited = {self.url}
+            elements = worker.element_count()
+            idle_scrolls = 0
+            while True:
+                url = worker.driver.current_url
+                visited.add(url)
+                step = self._step(url, self._browser_values(worker, xpaths))
+                yield step
+                if self.steps >= self.max_pages:
+                    return 'max_pages'
+
+                if self.pagination == 'scroll':
+                    # Only scrolls that grow the page start a new step
+                    while True:
+                        count = worker.scroll_down(options.get('max_wait', DEFAULT_MAX_WAIT),
+                                                   options.get('idle_ms', DEFAULT_IDLE_MS))
+                        if count > elements:
+                            elements, idle_scrolls = count, 0
+                            break
+                        idle_scrolls += 1
+                        if idle_scrolls >= SCROLL_IDLE_STEPS:
+                            return 'scroll_exhausted'
+                else:
+                    if not step['new']:
+                        return 'no_new_items'
+                    if not worker.follow_next(self.next_selector, visited, **navigation):
+                        return 'no_next'
+
+    def _browser_values(self, worker, xpaths):
+        """Extracted values for the matches the browser reports as new or changed"""
+        extracted = [[] for _ in self.rules]
+        if not xpaths:
+            return extracted
+        matches = worker.new_matches([xpath for _, xpath in xpaths])
+        for (i, _), match in zip(xpaths, matches):
+            rule = self.rules[i]
+            if 'error' in match:
+                print(f"Extraction error: {match['error']}")
+                continue
+            if 'value' in match:
+                nodes = match['value']
+            else:
+                nodes = [browser_node(kind, snapshot) for kind, snapshot in match['nodes']]
+            extracted[i] = extraction_engine.values(nodes, rule.attribute, rule.pattern)
+        return extracted
+
+
+def browser_node(kind, snapshot):
+    """Node reported by INCREMENTAL_MATCH_SCRIPT: an lxml element parsed from its outerHTML, or a string"""
+    if kind != 'element':
+        return snapshot
+    match = DOCUMENT_TAG_RE.match(snapshot)
+    if match:
+        # The fragment parser drops <html>, <head> and <body> tags, so these are parsed as a document
+        document = lxml.html.document_fromstring(snapshot)
+        tag = match.group(1).lower()
+        return document if tag == 'html' else document.find(tag)
+    parent = lxml.html.fragment_fromstring(snapshot, create_parent='div')
+    # Markup the parser restructures stays under the wrapper rather than losing elements
+    return parent[0] if len(parent) == 1 else parent
+
+def rule_name(rule):
+    """Name of a rule dict or CompiledRule"""
+    return rule.name if isinstance(rule, CompiledRule) else rule.get('name', 'unnamed')
+
+def expand_url_template(template, start, end, step=1):
+    """Expand a URL containing {page} over an inclusive page range"""
+    return [template.replace('{page}', str(page)) for page in range(start, end + 1, step or 1)]
 
-# Initialize scraper instance
+def start_job(job):
+    """Register a job, dropping the oldest finished ones beyond MAX_JOBS, and run it in the background"""
+    jobs_store[job.id] = job
+    finished = [job_id for job_id, stored in jobs_store.items() if stored.status in ('completed', 'cancelled')]
+    while len(jobs_store) > MAX_JOBS and finished:
+        del jobs_store[finished.pop(0)]
+    thread = threading.Thread(target=job.run, name=f'job-{job.id[:8]}', daemon=True)
+    thread.start()
+
+# Reference results for batch_extract's diff mode
+diff_baselines = DiffBaselines(DIFF_MAX_BASELINES)
+
+# Crawl jobs by ID, oldest first
+jobs_store = OrderedDict()
+domain_throttle = DomainThrottle()
+
+# Shared extraction engine with its compiled selector cache
+extraction_engine = ExtractionEngine()
+
+# Parsed documents for stored sessions; created first because the store drops entries from it
+document_cache = DocumentCache(DOM_CACHE_MB * 1024 * 1024, DOM_CACHE_MAX_ENTRIES)
+
+# Scraped pages by session ID
+scraped_data_store = PageStore(
+    PAGE_STORE_DIR,
+    PAGE_STORE_MEMORY_MB * 1024 * 1024,
+    PAGE_STORE_DISK_MB * 1024 * 1024,
+    ttl=PAGE_STORE_TTL,
+    codec=PAGE_STORE_CODEC
+)
+
+# Compressed page sources served by /api/html
+encoded_body_cache = EncodedBodyCache(ENCODED_CACHE_MB * 1024 * 1024)
+
+# Process pool for extraction over many stored pages
+parallel_extractor = ParallelExtractor(workers=EXTRACT_WORKERS, chunk_size=EXTRACT_CHUNK_SIZE)
+# Event loop thread for the async fetch backend
+async_backend = AsyncBackend(
+    max_connections=ASYNC_MAX_CONNECTIONS,
+    max_tabs=ASYNC_BROWSER_TABS,
+    headless=True
+)
+driver_launcher = DriverLauncher(
+    explicit_path=CHROMEDRIVER_PATH,
+    cache_file=CHROMEDRIVER_CACHE_FILE,
+    offline=OFFLINE
+)
+resource_meter = ResourceMeter()
+# Shared HTTP client for the http/auto fetch modes
+http_fetcher = HttpFetcher(
+    pool_size=HTTP_POOL_SIZE,
+    timeout=HTTP_TIMEOUT,
+    cache_ttl=HTTP_CACHE_TTL,
+    domain_ttls=HTTP_CACHE_DOMAIN_TTLS,
+    max_cache_entries=HTTP_CACHE_ENTRIES
+)
+
+# Initialize scraper instance (used for parsing/extraction helpers)
 scraper = SeleniumScraper()
 
+# Pool of browser sessions used for scraping
+driver_pool = WebDriverPool(
+    size=POOL_SIZE,
+    headless=CHROME_HEADLESS,
+    max_pages=POOL_MAX_PAGES,
+    max_idle=POOL_MAX_IDLE,
+    checkout_timeout=POOL_CHECKOUT_TIMEOUT
+)
+
 @app.route('/')
 def index():
     """Main page"""
     return render_template('index.html')
 
+def resolve_rules(data, require=True, validate=True, as_dicts=False):
+    """Inline `rules` plus saved rules referenced by `rule_ids`.
+
+    Saved rules are returned in compiled form, or as plain dicts with as_dicts (e.g. to send
+    them to worker processes). Returns (rules, error).
+    """
+    rules = list(data.get('rules', []))
+    for rule_id in data.get('rule_ids', []):
+        if rule_id not in compiled_rules_store:
+            return None, f'Rule not found: {rule_id}'
+        compiled = compiled_rules_store[rule_id]
+        rules.append(compiled.as_dict() if as_dicts else compiled)
+    if require and not rules:
+        return None, 'At least one rule is required'
+    for rule in rules:
+        if isinstance(rule, CompiledRule):
+            continue
+        if not isinstance(rule, dict):
+            return None, 'Rules must be objects'
+        if validate:
+            try:
+                extraction_engine.compile_rule(rule)
+            except (etree.XPathError, SelectorError, re.error, ValueError) as e:
+                return None, f'Invalid rule {rule_name(rule)}: {e}'
+    return rules, None
+
+def number_param(data, name, default, cast=int, low=None, high=None):
+    """Read a numeric parameter, clamped to [low, high]. Returns (value, error)"""
+    try:
+        value = cast(data.get(name, default))
+    except (TypeError, ValueError):
+        return None, f'{name} must be a number'
+    if not math.isfinite(value):
+        return None, f'{name} must be a number'
+    if low is not None:
+        value = max(low, value)
+    if high is not None:
+        value = min(high, value)
+    return value, None
+
+def parse_fetch_options(data):
+    """Read fetch mode and readiness options from a request body.
+
+    Returns (mode, wait_options, error).
+    """
+    mode = data.get('mode', DEFAULT_FETCH_MODE)
+    wait_options = {
+        'wait_time': data.get('wait_time', 3),
+        'wait_strategy': data.get('wait_strategy', DEFAULT_WAIT_STRATEGY),
+        'max_wait': data.get('max_wait', DEFAULT_MAX_WAIT),
+        'idle_ms': data.get('idle_ms', DEFAULT_IDLE_MS),
+        'wait_for': data.get('wait_for', []),
+        'use_cache': data.get('use_cache', True),
+        'resource_policy': data.get('resource_policy', DEFAULT_RESOURCE_POLICY),
+        'backend': data.get('backend', DEFAULT_BACKEND)
+    }
+    if mode not in FETCH_MODES:
+        return None, None, f"Unknown mode, use one of: {', '.join(FETCH_MODES)}"
+    if wait_options['backend'] not in BACKENDS:
+        return None, None, f"Unknown backend, use one of: {', '.join(BACKENDS)}"
+    if wait_options['backend'] == 'async' and aiohttp is None:
+        return None, None, "The async backend needs aiohttp (pip install aiohttp)"
+    if wait_options['resource_policy'] not in RESOURCE_POLICY_CHOICES:
+        return None, None, f"Unknown resource_policy, use one of: {', '.join(RESOURCE_POLICY_CHOICES)}"
+    if wait_options['wait_strategy'] not in WAIT_STRATEGIES:
+        return None, None, f"Unknown wait_strategy, use one of: {', '.join(WAIT_STRATEGIES)}"
+    return mode, wait_options, None
+
+def page_title(html):
+    """Title of a page read from its head with a regex, without parsing the document"""
+    head_end = HEAD_END_RE.search(html)
+    match = TITLE_RE.search(html, 0, head_end.start() if head_end else len(html))
+    if not match:
+        return None
+    return ' '.join(unescape(match.group(1)).split()) or None
+
+def compressed_response(body, etag, mimetype, filename=None):
+    """Serve bytes with ETag revalidation, byte ranges and gzip/brotli chosen from Accept-Encoding.
+
+    Range requests get the uncompressed body so offsets refer to the page itself.
+    """
+    encoding = None
+    if 'Range' not in request.headers and len(body) >= COMPRESS_MIN_BYTES:
+        if brotli is not None and request.accept_encodings['br']:
+            encoding = 'br'
+        elif request.accept_encodings['gzip']:
+            encoding = 'gzip'
+
+    if encoding == 'br':
+        data = encoded_body_cache.get((etag, encoding), lambda: brotli.compress(body, quality=5))
+    elif encoding == 'gzip':
+        data = encoded_body_cache.get((etag, encoding), lambda: gzip.compress(body, compresslevel=6))
+    else:
+        data = body
+
+    response = Response(data, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    # Sessions never change content, but they expire; revalidating is a cheap 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+
+def normalize_url(url):
+    """Default to https when no scheme is given"""
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
 @app.route('/api/scrape', methods=['POST'])
 def api_scrape():
     """API endpoint to scrape a URL"""
     data = request.json
     url = data.get('url', '')
-    wait_time = data.get('wait_time', 3)
+    rules = data.get('rules', [])
     
     if not url:
         return jsonify({'success': False, 'error': 'URL is required'})
+
+    mode, wait_options, error = parse_fetch_options(data)
+    if error:
+        return jsonify({'success': False, 'error': error})
     
     # Validate URL
-    if not url.startswith(('http://', 'https://')):
-        url = 'https://' + url
+    url = normalize_url(url)
+
+    try:
+        max_age = float(data['max_age']) if data.get('max_age') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'max_age must be a number of seconds'})
     
     try:
-        html, error = scraper.scrape_url(url, wait_time)
-        if error:
-            return jsonify({'success': False, 'error': error})
-        
-        # Store the scraped data
-        session_id = str(uuid.uuid4())
-        scraped_data_store[session_id] = {
-            'url': url,
-            'html': html,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        # Parse for preview
-        soup = BeautifulSoup(html, 'html.parser')
-        title = soup.title.string if soup.title else 'No title'
+        # A recent enough snapshot of this URL is served without fetching anything
+        session_id = scraped_data_store.latest(url, max_age) if max_age is not None else None
+        record = scraped_data_store.get(session_id) if session_id else None
+        if record is not None:
+            html = record['html']
+            fetch_info = {'fetched_with': 'snapshot', 'fallback_reason': None, 'readiness': None,
+                          'http_cache': None, 'resources': None}
+        else:
+            html, error, fetch_info = fetch_page(url, mode, rules, **wait_options)
+            if error:
+                return jsonify({'success': False, 'error': error})
 
+            # Store the scraped data
+            session_id = store_session(url, html, fetch_info['document'])
+        
         return jsonify({
             'success': True,
             'session_id': session_id,
-            'title': title,
+            'title': page_title(html) or 'No title',
             'html_length': len(html),
-            'preview': html  # Return full HTML, not truncated
+            'html_url': f'/api/html/{session_id}',
+            **scraped_data_store.snapshot_info(session_id),
+            'fetched_with': fetch_info['fetched_with'],
+            'fallback_reason': fetch_info['fallback_reason'],
+            'readiness': fetch_info['readiness'],
+            'http_cache': fetch_info['http_cache'],
+            'resources': fetch_info['resources']
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/pool_status', methods=['GET'])
+def pool_status():
+    """Get WebDriver pool usage and ChromeDriver launch timings"""
+    return jsonify({'success': True, 'pool': driver_pool.status(), 'driver': driver_launcher.status()})
+
+@app.route('/api/cache_status', methods=['GET'])
+def cache_status():
+    """Get parsed document cache usage"""
+    return jsonify({
+        'success': True,
+        'pages': scraped_data_store.status(),
+        'cache': document_cache.status(),
+        'http_cache': http_fetcher.status(),
+        'encoded_bodies': encoded_body_cache.status(),
+        'diff_baselines': diff_baselines.status(),
+        'compiled_selectors': extraction_engine.status()
+    })
+
 @app.route('/api/get_elements', methods=['POST'])
 def get_elements():
-    """Get all elements from scraped page for visual selector"""
-    data = request.json
-    session_id = data.get('session_id', '')
+    """Get elements from scraped page for visual selector, whole or one category page at a time"""
+    params = {**request.args.to_dict(), **(request.get_json(silent=True) or {})}
+    session_id = params.get('session_id', '')
     
-    if session_id not in scraped_data_store:
+    # One lookup: the session can expire between a membership test and the fetch
+    document = document_cache.get(session_id)
+    if document is None:
         return jsonify({'success': False, 'error': 'Session not found'})
     
-    html = scraped_data_store[session_id]['html']
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # Extract common elements
-    elements = {
-        'headings': [],
-        'links': [],
-        'images': [],
-        'paragraphs': [],
-        'divs': [],
-        'spans': [],
-        'tables': [],
-        'lists': [],
-        'forms': [],
-        'buttons': [],
-        'inputs': []
-    }
-    
-    # Extract headings
-    for i, h in enumerate(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])):
-        elements['headings'].append({
-            'index': i,
-            'tag': h.name,
-            'text': h.get_text(strip=True)[:100],
-            'selector': scraper._get_css_selector(h),
-            'id': h.get('id', ''),
-            'class': ' '.join(h.get('class', []))
-        })
-    
-    # Extract links
-    for i, a in enumerate(soup.find_all('a', href=True)):
-        elements['links'].append({
-            'index': i,
-            'text': a.get_text(strip=True)[:50],
-            'href': a['href'],
-            'selector': f"a[href='{a['href']}']",
-            'id': a.get('id', ''),
-            'class': ' '.join(a.get('class', []))
-        })
-    
-    # Extract images
-    for i, img in enumerate(soup.find_all('img')):
-        elements['images'].append({
-            'index': i,
-            'src': img.get('src', ''),
-            'alt': img.get('alt', ''),
-            'selector': f"img[alt='{img.get('alt', '')}']" if img.get('alt') else f"img[src*='{img.get('src', '').split('/')[-1]}']",
-            'id': img.get('id', ''),
-            'class': ' '.join(img.get('class', []))
-        })
-    
-    # Extract paragraphs
-    for i, p in enumerate(soup.find_all('p')):
-        text = p.get_text(strip=True)
-        if text:
-            elements['paragraphs'].append({
-                'index': i,
-                'text': text[:150],
-                'selector': scraper._get_css_selector(p),
-                'id': p.get('id', ''),
-                'class': ' '.join(p.get('class', []))
-            })
-    
-    # Extract tables
-    for i, table in enumerate(soup.find_all('table')):
-        elements['tables'].append({
-            'index': i,
-            'rows': len(table.find_all('tr')),
-            'selector': scraper._get_css_selector(table),
-            'id': table.get('id', ''),
-            'class': ' '.join(table.get('class', []))
-        })
-    
-    # Extract lists
-    for i, ul in enumerate(soup.find_all(['ul', 'ol'])):
-        items = len(ul.find_all('li'))
-        elements['lists'].append({
-            'index': i,
-            'tag': ul.name,
-            'items': items,
-            'selector': scraper._get_css_selector(ul),
-            'id': ul.get('id', ''),
-            'class': ' '.join(ul.get('class', []))
-        })
-    
-    # Extract forms
-    for i, form in enumerate(soup.find_all('form')):
-        elements['forms'].append({
-            'index': i,
-            'action': form.get('action', ''),
-            'selector': scraper._get_css_selector(form),
-            'id': form.get('id', ''),
-            'class': ' '.join(form.get('class', []))
-        })
-    
-    # Extract buttons
-    for i, btn in enumerate(soup.find_all(['button', 'input[type="submit"]'])):
-        elements['buttons'].append({
-            'index': i,
-            'text': btn.get_text(strip=True) or btn.get('value', ''),
-            'selector': scraper._get_css_selector(btn),
-            'id': btn.get('id', ''),
-            'class': ' '.join(btn.get('class', []))
-        })
-    
-    # Extract inputs
-    for i, inp in enumerate(soup.find_all('input')):
-        elements['inputs'].append({
-            'index': i,
-            'type': inp.get('type', 'text'),
-            'name': inp.get('name', ''),
-            'placeholder': inp.get('placeholder', ''),
-            'selector': f"input[name='{inp.get('name', '')}']" if inp.get('name') else f"input[type='{inp.get('type', 'text')}']",
-            'id': inp.get('id', ''),
-            'class': ' '.join(inp.get('class', []))
+    inventory = document.inventory
+
+    # One category at a time, paged, so the UI only loads what it shows
+    category = params.get('category')
+    if category:
+        if category not in ELEMENT_CATEGORIES:
+            return jsonify({'success': False, 'error': f"Unknown category, use one of: {', '.join(ELEMENT_CATEGORIES)}"})
+        try:
+            offset = max(0, int(params.get('offset', 0)))
+            limit = max(1, int(params.get('limit', ELEMENTS_PAGE_SIZE)))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'offset and limit must be integers'})
+        return jsonify({
+            'success': True,
+            'category': category,
+            'total': inventory.counts()[category],
+            'offset': offset,
+            'limit': limit,
+            'items': inventory.page(category, offset, limit)
         })
-    
-    return jsonify({'success': True, 'elements': elements})
+
+    counts = inventory.counts()
+    if str(params.get('summary', '')).lower() in ('1', 'true', 'yes'):
+        return jsonify({'success': True, 'counts': counts})
+
+    elements = {category: inventory.page(category) for category in ELEMENT_CATEGORIES}
+    return jsonify({'success': True, 'elements': elements, 'counts': counts})
 
 @app.route('/api/extract', methods=['POST'])
 def api_extract():
@@ -395,15 +3553,16 @@ def api_extract():
     data = request.json
     session_id = data.get('session_id', '')
     rule = data.get('rule', {})
+    if data.get('rule_id'):
+        rule = compiled_rules_store.get(data['rule_id'])
+        if rule is None:
+            return jsonify({'success': False, 'error': 'Rule not found'})
     
-    if session_id not in scraped_data_store:
+    document = document_cache.get(session_id)
+    if document is None:
         return jsonify({'success': False, 'error': 'Session not found'})
     
-    html = scraped_data_store[session_id]['html']
-    scraper.html_content = html
-    scraper.soup = BeautifulSoup(html, 'html.parser')
-    
-    results = scraper.extract_by_rule(rule)
+    results = scraper.extract_by_rule(rule, document)
     
     return jsonify({
         'success': True,
@@ -417,7 +3576,7 @@ def save_rule():
     data = request.json
     rule_id = str(uuid.uuid4())
     
-    extraction_rules_store[rule_id] = {
+    rule = {
         'id': rule_id,
         'name': data.get('name', 'Unnamed Rule'),
         'selector_type': data.get('selector_type', 'css'),
@@ -425,6 +3584,16 @@ def save_rule():
         'attribute': data.get('attribute', 'text'),
         'created_at': datetime.now().isoformat()
     }
+    if data.get('regex'):
+        rule['regex'] = data['regex']
+
+    try:
+        compiled = extraction_engine.compile_rule(rule)
+    except (etree.XPathError, SelectorError, re.error, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Invalid rule: {e}'})
+
+    extraction_rules_store[rule_id] = rule
+    compiled_rules_store[rule_id] = compiled
     
     return jsonify({'success': True, 'rule_id': rule_id})
 
@@ -441,89 +3610,330 @@ def delete_rule(rule_id):
     """Delete an extraction rule"""
     if rule_id in extraction_rules_store:
         del extraction_rules_store[rule_id]
+        compiled_rules_store.pop(rule_id, None)
         return jsonify({'success': True})
     return jsonify({'success': False, 'error': 'Rule not found'})
 
+# Bytes buffered before a streamed export chunk is flushed
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Rows per Parquet row group / Arrow record batch
+EXPORT_ROW_GROUP_SIZE = int(os.getenv('SCRAPEBI_EXPORT_ROW_GROUP', 50000))
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'feather': ('feather', 'application/vnd.apache.arrow.file'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Parquet/Arrow export needs the optional pyarrow package
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+def iter_export_records(data):
+    """Yield rule/index/value records from the request body or a finished crawl job"""
+    job_id = data.get('job_id')
+    if job_id:
+        job = jobs_store.get(job_id)
+        if job is None:
+            return
+        for result in job.results_page(0, len(job.results)):
+            for rule, values in result.get('results', {}).items():
+                for index, value in enumerate(values):
+                    yield {'url': result['url'], 'rule': rule, 'index': index, 'value': value}
+        return
+    yield from data.get('data', [])
+
+def group_export_values(records):
+    """Group record values by rule name, keeping first-seen rule order"""
+    grouped = {}
+    for item in records:
+        grouped.setdefault(item.get('rule', 'unnamed'), []).append(item.get('value', ''))
+    return grouped
+
+def stream_json(records):
+    """Stream {rule: [values]} exactly as json.dump(..., indent=2) would write it"""
+    grouped = group_export_values(records)
+    if not grouped:
+        yield '{}'
+        return
+    yield '{'
+    for rule_number, (rule, values) in enumerate(grouped.items()):
+        yield (',' if rule_number else '') + '\n  ' + json.dumps(rule, ensure_ascii=False) + ': ['
+        for value_number, value in enumerate(values):
+            encoded = json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+            yield (',' if value_number else '') + '\n    ' + encoded
+        yield '\n  ]'
+    yield '\n}'
+
+def stream_csv(records, columns):
+    """Stream records as fully quoted CSV rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(columns)
+    for item in records:
+        row = {
+            'url': item.get('url', ''),
+            'rule': item.get('rule', 'unnamed'),
+            'index': item.get('index', ''),
+            'value': item.get('value', '')
+        }
+        # If value is a dict/list, convert to JSON string
+        if isinstance(row['value'], (dict, list)):
+            row['value'] = json.dumps(row['value'], ensure_ascii=False)
+        writer.writerow([row[column] for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def stream_txt(records):
+    """Stream values grouped under rule headers"""
+    for rule, values in group_export_values(records).items():
+        yield f"=== {rule} ===\n" + "-" * 50 + "\n"
+        for i, value in enumerate(values, 1):
+            # Handle dict/list values
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False, indent=2)
+            yield f"{i}. {value}\n"
+        yield "\n"
+
+def stream_ndjson(records):
+    """Stream one JSON record per line"""
+    for item in records:
+        yield json.dumps({
+            **({'url': item['url']} if 'url' in item else {}),
+            'rule': item.get('rule', 'unnamed'),
+            'index': item.get('index', ''),
+            'value': item.get('value', '')
+        }, ensure_ascii=False) + '\n'
+
+# Strings that convert losslessly to numbers (no leading zeros, so codes stay text)
+INT_STRING_RE = re.compile(r'-?(0|[1-9]\d*)')
+FLOAT_STRING_RE = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+def fits_int64(value):
+    """Whether an int is within Arrow's int64 range"""
+    return INT64_MIN <= value <= INT64_MAX
+
+def finite_float(value):
+    """Whether a numeric string converts to a finite float (1e400 would become inf)"""
+    return math.isfinite(float(value))
+
+def pivot_export_records(records):
+    """Pivot rule/index/value records into ordered row keys and one {row_key: value} map per rule"""
+    row_keys = {}
+    columns = {}
+    for item in records:
+        key = (item.get('url', ''), item.get('index', ''))
+        row_keys.setdefault(key, None)
+        columns.setdefault(item.get('rule', 'unnamed'), {})[key] = item.get('value')
+    return list(row_keys), columns
+
+def column_type(values, infer_types=True):
+    """Pick an Arrow type for a column and the converter that produces matching Python values"""
+
+    present = [value for value in values if value is not None and value != '']
+    if present and all(isinstance(value, bool) for value in present):
+        return pa.bool_(), lambda value: None if value == '' else value
+    if present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        if all(fits_int64(value) for value in present):
+            return pa.int64(), lambda value: None if value == '' else value
+    elif present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        if all(isinstance(value, float) or fits_int64(value) for value in present):
+            return pa.float64(), lambda value: None if value in (None, '') else float(value)
+    elif infer_types and present and all(isinstance(value, str) for value in present):
+        # Numbers Arrow cannot hold exactly stay text rather than failing or turning into inf
+        if all(INT_STRING_RE.fullmatch(value) for value in present):
+            if all(fits_int64(int(value)) for value in present):
+                return pa.int64(), lambda value: None if value in (None, '') else int(value)
+        elif all(FLOAT_STRING_RE.fullmatch(value) for value in present):
+            if all(finite_float(value) for value in present):
+                return pa.float64(), lambda value: None if value in (None, '') else float(value)
+
+    def to_string(value):
+        if value is None:
+            return None
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value)
+    return pa.string(), to_string
+
+def unique_column_name(name, taken):
+    """Name suffixed _2, _3... until it is not in `taken`, for rules named like a key column"""
+    unique, number = name, 1
+    while unique in taken:
+        number += 1
+        unique = f'{name}_{number}'
+    taken.add(unique)
+    return unique
+
+def stream_columnar(records, export_format, infer_types=True, row_group_size=None):
+    """Stream records as Parquet or Arrow IPC with one typed column per rule, written in row groups.
+
+    The schema is settled when this is called, so problems surface before a response starts.
+    """
+
+    row_group_size = row_group_size or EXPORT_ROW_GROUP_SIZE
+    row_keys, rule_columns = pivot_export_records(records)
+
+    # Key columns first, then one column per rule in first-seen order
+    columns = []
+    if any(url for url, _ in row_keys):
+        columns.append(('url', lambda key: key[0], [key[0] for key in row_keys]))
+    columns.append(('index', lambda key: key[1], [key[1] for key in row_keys]))
+    keys = {name for name, _, _ in columns}
+    taken = keys | {str(rule) for rule in rule_columns}
+    for rule, values in rule_columns.items():
+        name = unique_column_name(str(rule), taken) if str(rule) in keys else str(rule)
+        columns.append((name, values.get, list(values.values())))
+
+    fields, converters = [], []
+    for name, getter, values in columns:
+        arrow_type, convert = column_type(values, infer_types)
+        fields.append(pa.field(name, arrow_type))
+        converters.append((getter, convert))
+    schema = pa.schema(fields)
+    return write_columnar(row_keys, fields, converters, schema, export_format, row_group_size)
+
+def write_columnar(row_keys, fields, converters, schema, export_format, row_group_size):
+    """Yield Parquet or Arrow IPC bytes one row group at a time"""
+
+    # The writer pushes bytes into `pending`, which is drained after every row group
+    pending = []
+    sink = pa.PythonFile(ExportSink(pending), mode='w')
+    if export_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+        write = writer.write_table
+
+    for start in range(0, max(len(row_keys), 1), row_group_size):
+        chunk = row_keys[start:start + row_group_size]
+        arrays = [
+            pa.array([convert(getter(key)) for key in chunk], type=field.type)
+            for (getter, convert), field in zip(converters, fields)
+        ]
+        write(pa.Table.from_arrays(arrays, schema=schema))
+        yield b''.join(pending)
+        pending.clear()
+
+    writer.close()
+    yield b''.join(pending)
+
+
+class ExportSink:
+    """Write-only file object collecting bytes for a streamed response"""
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.closed = False
+        self.position = 0
+
+    def write(self, data):
+        self.pending.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def chunked(parts, size=EXPORT_CHUNK_SIZE):
+    """Join small string parts into encoded chunks of roughly `size` bytes"""
+    pending = []
+    pending_size = 0
+    for part in parts:
+        pending.append(part)
+        pending_size += len(part)
+        if pending_size >= size:
+            yield ''.join(pending).encode('utf-8')
+            pending = []
+            pending_size = 0
+    if pending:
+        yield ''.join(pending).encode('utf-8')
+
+def attachment_response(parts, filename, mimetype):
+    """Stream parts to the client as a file download"""
+    return Response(
+        stream_with_context(chunked(parts)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @app.route('/api/export', methods=['POST'])
 def export_data():
     """Export extracted data to various formats"""
     data = request.json
     export_format = data.get('format', 'json')
-    extracted_data = data.get('data', [])
 
-    if not extracted_data:
+    if data.get('job_id'):
+        if data['job_id'] not in jobs_store:
+            return jsonify({'success': False, 'error': 'Job not found'})
+    elif not data.get('data'):
         return jsonify({'success': False, 'error': 'No data to export'})
 
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"extracted_data_{timestamp}"
+    records = iter_export_records(data)
 
-    # Use Windows-compatible temp directory
-    temp_dir = tempfile.gettempdir()
+    if export_format == 'json':
+        # Export as structured JSON with rule names as keys
+        return attachment_response(stream_json(records), f"{filename}.json", 'application/json')
 
-    try:
-        if export_format == 'json':
-            # Export as structured JSON with rule names as keys
-            filepath = os.path.join(temp_dir, f"{filename}.json")
-            # Reorganize data by rule name
-            structured_data = {}
-            for item in extracted_data:
-                rule_name = item.get('rule', 'unnamed')
-                value = item.get('value', '')
-                if rule_name not in structured_data:
-                    structured_data[rule_name] = []
-                structured_data[rule_name].append(value)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(structured_data, f, indent=2, ensure_ascii=False)
-            return send_file(filepath, as_attachment=True, download_name=f"{filename}.json")
-
-        elif export_format == 'csv':
-            # Export with columns: rule, index, value
-            filepath = os.path.join(temp_dir, f"{filename}.csv")
-            # Prepare data for CSV - handle nested objects
-            csv_data = []
-            for item in extracted_data:
-                row = {
-                    'rule': item.get('rule', 'unnamed'),
-                    'index': item.get('index', ''),
-                    'value': item.get('value', '')
-                }
-                # If value is a dict/list, convert to JSON string
-                if isinstance(row['value'], (dict, list)):
-                    row['value'] = json.dumps(row['value'], ensure_ascii=False)
-                csv_data.append(row)
-            df = pd.DataFrame(csv_data)
-            df.to_csv(filepath, index=False, encoding='utf-8', quoting=1)  # QUOTE_ALL
-            return send_file(filepath, as_attachment=True, download_name=f"{filename}.csv")
-
-        elif export_format == 'txt':
-            # Export as clean text with rule headers
-            filepath = os.path.join(temp_dir, f"{filename}.txt")
-            # Group by rule name for cleaner output
-            rules_data = {}
-            for item in extracted_data:
-                rule_name = item.get('rule', 'unnamed')
-                value = item.get('value', '')
-                if rule_name not in rules_data:
-                    rules_data[rule_name] = []
-                rules_data[rule_name].append(value)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                for rule_name, values in rules_data.items():
-                    f.write(f"=== {rule_name} ===\n")
-                    f.write("-" * 50 + "\n")
-                    for i, value in enumerate(values, 1):
-                        # Handle dict/list values
-                        if isinstance(value, (dict, list)):
-                            value = json.dumps(value, ensure_ascii=False, indent=2)
-                        f.write(f"{i}. {value}\n")
-                    f.write("\n")
-            return send_file(filepath, as_attachment=True, download_name=f"{filename}.txt")
+    elif export_format == 'csv':
+        # Export with columns: rule, index, value (and url for crawl jobs)
+        columns = ['url', 'rule', 'index', 'value'] if data.get('job_id') else ['rule', 'index', 'value']
+        return attachment_response(stream_csv(records, columns), f"{filename}.csv", 'text/csv')
 
-        else:
-            return jsonify({'success': False, 'error': 'Unsupported format'})
+    elif export_format == 'txt':
+        # Export as clean text with rule headers
+        return attachment_response(stream_txt(records), f"{filename}.txt", 'text/plain')
 
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    elif export_format == 'ndjson':
+        # One rule/index/value record per line
+        return attachment_response(stream_ndjson(records), f"{filename}.ndjson", 'application/x-ndjson')
+
+    elif export_format in COLUMNAR_FORMATS:
+        # One typed column per rule, one row per index (and url for crawl jobs)
+        if pa is None:
+            return jsonify({'success': False, 'error': 'pyarrow is required for Parquet/Arrow export: pip install pyarrow'})
+        extension, mimetype = COLUMNAR_FORMATS[export_format]
+        parts = stream_columnar(records, export_format, infer_types=data.get('infer_types', True))
+        return Response(
+            stream_with_context(parts),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}.{extension}"'}
+        )
+
+    else:
+        return jsonify({'success': False, 'error': 'Unsupported format'})
+
+def session_preview(session_id):
+    """(preview bytes, ETag) for a session, or None; the document is built once and cached with the parsed page"""
+    record = scraped_data_store.get(session_id)
+    document = document_cache.get(session_id) if record is not None else None
+    if document is None:
+        return None
+    url_key = hashlib.sha256(record['url'].encode('utf-8')).hexdigest()[:16]
+    etag = f"{scraped_data_store.content_hash(session_id)}-preview{PREVIEW_VERSION}-{url_key}"
+    return document.preview(record['url']), etag
+
+@app.route('/api/preview/<session_id>', methods=['GET'])
+def preview_document(session_id):
+    """Sanitized visual-selector document for a session, compressed and ETag-cached"""
+    preview = session_preview(session_id)
+    if preview is None:
+        return jsonify({'success': False, 'error': 'Session not found'}), 404
+    body, etag = preview
+    return compressed_response(body, etag, 'text/html')
 
 @app.route('/api/preview_html', methods=['POST'])
 def preview_html():
@@ -531,73 +3941,51 @@ def preview_html():
     data = request.json
     session_id = data.get('session_id', '')
 
-    if session_id not in scraped_data_store:
+    preview = session_preview(session_id)
+    if preview is None:
         return jsonify({'success': False, 'error': 'Session not found'})
 
-    html = scraped_data_store[session_id]['html']
-
-    # Add base tag to resolve relative URLs and highlight script for visual selection
-    base_script = '''
-    <base href="''' + scraped_data_store[session_id]['url'] + '''">
-    <script>
-    document.addEventListener('DOMContentLoaded', function() {
-        let selectedElement = null;
-
-        // Add visual selection to all elements
-        document.querySelectorAll('*').forEach(el => {
-            el.addEventListener('mouseover', function(e) {
-                e.stopPropagation();
-                this.style.outline = '2px solid #3b82f6';
-                this.style.cursor = 'pointer';
-            });
-
-            el.addEventListener('mouseout', function(e) {
-                e.stopPropagation();
-                if (this !== selectedElement) {
-                    this.style.outline = '';
-                    this.style.cursor = '';
-                }
-            });
+    return jsonify({'success': True, 'html': preview[0].decode('utf-8')})
 
-            el.addEventListener('click', function(e) {
-                e.preventDefault();
-                e.stopPropagation();
+@app.route('/api/element_info', methods=['POST'])
+def element_info():
+    """Describe the element behind a preview data-sbi-id: unique selector, similar elements and XPath"""
+    data = request.json
+    session_id = data.get('session_id', '')
 
-                if (selectedElement) {
-                    selectedElement.style.outline = '';
-                }
-                selectedElement = this;
-                this.style.outline = '3px solid #10b981';
-
-                // Send element info to parent
-                window.parent.postMessage({
-                    type: 'element_selected',
-                    tag: this.tagName,
-                    id: this.id,
-                    className: this.className,
-                    text: this.textContent.trim().substring(0, 100)
-                }, '*');
-            });
-        });
-
-        // Prevent navigation
-        document.querySelectorAll('a').forEach(a => {
-            a.addEventListener('click', function(e) {
-                e.preventDefault();
-            });
-        });
-    });
-    </script>
-    '''
+    document = document_cache.get(session_id)
+    if document is None:
+        return jsonify({'success': False, 'error': 'Session not found'})
 
-    # Insert after opening head tag or at beginning
-    if '<head>' in html:
-        html = html.replace('<head>', '<head>' + base_script, 1)
-    else:
-        # If no head tag, insert at beginning
-        html = base_script + html
+    positions = document.positions
+    node_id = data.get('node_id')
+    if not isinstance(node_id, int) or isinstance(node_id, bool) or not 0 <= node_id < len(positions.elements):
+        return jsonify({'success': False, 'error': 'Unknown node_id'})
+
+    node = positions.elements[node_id]
+    similar, similar_count = positions.similar_selector(node)
+    return jsonify({
+        'success': True,
+        'node_id': node_id,
+        'element': {
+            **extraction_engine.element_info(node, positions),
+            'similar_selector': similar,
+            'similar_count': similar_count
+        }
+    })
 
-    return jsonify({'success': True, 'html': html})
+@app.route('/api/html/<session_id>', methods=['GET'])
+def page_html(session_id):
+    """Page source of a session, compressed, ETag-cached and range-capable; ?download=1 for a file"""
+    record = scraped_data_store.get(session_id)
+    if record is None:
+        return jsonify({'success': False, 'error': 'Session not found'}), 404
+
+    filename = None
+    if request.args.get('download', '').lower() in ('1', 'true', 'yes'):
+        filename = urlparse(record['url']).netloc.replace('.', '_') + '_page.html'
+    return compressed_response(record['html'].encode('utf-8'), scraped_data_store.content_hash(session_id),
+                               'text/html', filename)
 
 @app.route('/api/download_html', methods=['POST'])
 def download_html():
@@ -605,53 +3993,366 @@ def download_html():
     data = request.json
     session_id = data.get('session_id', '')
 
-    if session_id not in scraped_data_store:
+    record = scraped_data_store.get(session_id)
+    if record is None:
         return jsonify({'success': False, 'error': 'Session not found'})
 
-    html = scraped_data_store[session_id]['html']
-    url = scraped_data_store[session_id]['url']
+    html = record['html']
+    url = record['url']
     
     # Create a safe filename from URL
-    from urllib.parse import urlparse
     parsed_url = urlparse(url)
     filename = parsed_url.netloc.replace('.', '_') + '_page.html'
-    
-    # Save to temp file and send
-    import tempfile
-    import os
-    temp_dir = tempfile.gettempdir()
-    filepath = os.path.join(temp_dir, filename)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(html)
-    
-    return send_file(filepath, as_attachment=True, download_name=filename)
+
+    return compressed_response(html.encode('utf-8'), scraped_data_store.content_hash(session_id),
+                               'text/html', filename)
 
 @app.route('/api/batch_extract', methods=['POST'])
 def batch_extract():
     """Run multiple extraction rules at once"""
     data = request.json
     session_id = data.get('session_id', '')
-    rules = data.get('rules', [])
+    url = data.get('url', '')
+    fetch_info = None
+
+    # Saved rules can be referenced by ID to reuse their compiled form; a rule that fails to
+    # compile just returns no values here, except in diff mode, whose baselines are keyed by the
+    # compiled rule set
+    diff = bool(data.get('diff'))
+    rules, error = resolve_rules(data, require=False, validate=diff)
+    if error:
+        return jsonify({'success': False, 'error': error}), (400 if diff else 200)
+
+    # A URL instead of a session scrapes the page first using the requested mode
+    if url and not session_id:
+        mode, wait_options, error = parse_fetch_options(data)
+        if error:
+            return jsonify({'success': False, 'error': error})
+        url = normalize_url(url)
+        try:
+            html, error, fetch_info = fetch_page(url, mode, rules, **wait_options)
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)})
+        if error:
+            return jsonify({'success': False, 'error': error})
+        session_id = store_session(url, html, fetch_info['document'])
     
     if session_id not in scraped_data_store:
         return jsonify({'success': False, 'error': 'Session not found'})
+
+    response = {
+        'success': True,
+        'session_id': session_id
+    }
+    if fetch_info:
+        response['fetched_with'] = fetch_info['fetched_with']
+        response['fallback_reason'] = fetch_info['fallback_reason']
+        response['readiness'] = fetch_info['readiness']
+        response['resources'] = fetch_info['resources']
+        response['http_cache'] = fetch_info['http_cache']
+        response.update(scraped_data_store.snapshot_info(session_id))
+
+        # Same content as the last scrape of this URL: the caller already has these results
+        if data.get('skip_unchanged') and response['unchanged']:
+            response['results'] = None
+            return jsonify(response)
     
-    html = scraped_data_store[session_id]['html']
-    scraper.html_content = html
-    scraper.soup = BeautifulSoup(html, 'html.parser')
+    if diff:
+        response['diff'] = diff_session(session_id, rules)
+        if response['diff'] is None:
+            return jsonify({'success': False, 'error': 'Session not found'})
+        return jsonify(response)
+
+    document = document_cache.get(session_id)
+    if document is None:
+        return jsonify({'success': False, 'error': 'Session not found'})
     
     results = {}
-    for rule in rules:
-        rule_name = rule.get('name', 'unnamed')
-        extracted = scraper.extract_by_rule(rule)
-        results[rule_name] = extracted
+    extracted = extraction_engine.extract_many(document.tree, rules)
+    for rule, values in zip(rules, extracted):
+        results[rule_name(rule)] = values
     
+    response['results'] = results
+    return jsonify(response)
+
+def diff_session(session_id, rules):
+    """Diff a session's rule results against the baseline for its URL and rule set, then advance the baseline.
+
+    A page whose content hash equals the baseline's is not extracted again. Returns None if the
+    session is gone before its page could be parsed.
+    """
+    url = scraped_data_store.session_url(session_id)
+    rule_set = DiffBaselines.rule_set_key(rules)
+    content_hash = scraped_data_store.content_hash(session_id)
+    baseline = diff_baselines.get(url, rule_set)
+    summary = {
+        'rule_set': rule_set,
+        'baseline_session_id': baseline['session_id'] if baseline else None,
+        'baseline_timestamp': baseline['timestamp'] if baseline else None
+    }
+
+    if baseline is not None and baseline['content_hash'] == content_hash:
+        diff_baselines.put(url, rule_set, {**baseline, 'session_id': session_id, 'timestamp': datetime.now().isoformat()})
+        names = [rule_name(rule) for rule in rules]
+        empty = {'added': {}, 'removed': {}, 'changed': {}}
+        summary['unchanged'] = True
+        summary['results'] = {name: {**empty, 'unchanged': len(baseline['results'].get(name, {}))} for name in names}
+        return summary
+
+    document = document_cache.get(session_id)
+    if document is None:
+        return None
+    keyed = extract_keyed(document, rules)
+    diff_baselines.put(url, rule_set, {
+        'session_id': session_id,
+        'content_hash': content_hash,
+        'timestamp': datetime.now().isoformat(),
+        'results': keyed
+    })
+    summary['unchanged'] = False
+    summary['results'] = diff_keyed(baseline['results'] if baseline else {}, keyed)
+    return summary
+
+@app.route('/api/bulk_scrape', methods=['POST'])
+def bulk_scrape():
+    """Fetch many URLs concurrently on the async backend, streaming one NDJSON line per page"""
+    data = request.json
+    urls = [normalize_url(url) for url in data.get('urls', [])]
+
+    if not urls:
+        return jsonify({'success': False, 'error': 'urls is required'})
+    if len(urls) > BULK_MAX_URLS:
+        return jsonify({'success': False, 'error': f'Bulk scrapes take at most {BULK_MAX_URLS} URLs, use /api/jobs'})
+    rules, error = resolve_rules(data, require=False)
+    if error:
+        return jsonify({'success': False, 'error': error})
+
+    data = dict(data, backend='async')
+    mode, options, error = parse_fetch_options(data)
+    if error:
+        return jsonify({'success': False, 'error': error})
+    options.pop('backend')
+    concurrency, error = number_param(data, 'concurrency', 50, int, 1, BULK_MAX_CONCURRENCY)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    store_pages = bool(data.get('store_pages', True))
+
+    results = queue.Queue()
+    future = async_backend.submit(async_backend.fetch_many(urls, results, mode, rules, concurrency, **options))
+
+    def generate():
+        try:
+            while True:
+                item = results.get()
+                if item is None:
+                    break
+                url, html, error, info = item
+                line = {'url': url, 'success': error is None, 'error': error}
+                if error is None:
+                    # Extraction runs here, in the request thread, so the event loop only does I/O
+                    document = info['document'] or ParsedDocument(html)
+                    if rules:
+                        extracted = extraction_engine.extract_many(document.tree, rules)
+                        line['results'] = {rule_name(rule): values for rule, values in zip(rules, extracted)}
+                    if store_pages:
+                        line['session_id'] = store_session(url, html, document)
+                        line.update(scraped_data_store.snapshot_info(line['session_id']))
+                    line['fetched_with'] = info['fetched_with']
+                    line['http_cache'] = info['http_cache']
+                yield json.dumps(line) + '\n'
+        finally:
+            # Client went away: stop fetching the rest
+            future.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/paginate', methods=['POST'])
+def paginate():
+    """Crawl a paginated or infinite-scroll listing, streaming one NDJSON line per step"""
+    data = request.json
+    pagination = data.get('pagination', 'next')
+
+    if pagination not in PAGINATION_MODES:
+        return jsonify({'success': False, 'error': f"Unknown pagination, use one of: {', '.join(PAGINATION_MODES)}"})
+    rules, error = resolve_rules(data)
+    if error:
+        return jsonify({'success': False, 'error': error})
+
+    template = data.get('url_template', '')
+    url = normalize_url(data.get('url', '')) if data.get('url') else None
+    if pagination == 'template' and '{page}' not in template:
+        return jsonify({'success': False, 'error': 'url_template must contain {page}'})
+    if pagination != 'template' and not url:
+        return jsonify({'success': False, 'error': 'url is required'})
+    if pagination == 'next' and not data.get('next_selector'):
+        return jsonify({'success': False, 'error': 'next_selector is required'})
+    # Browser steps parse each match on its own, so selectors and XPaths relative to the page are unknown
+    if pagination != 'template' and any(
+            (rule.attribute if isinstance(rule, CompiledRule) else rule.get('attribute', 'text')) == 'all'
+            for rule in rules):
+        return jsonify({'success': False, 'error': "attribute 'all' is only supported with template pagination"}), 400
+
+    mode, wait_options, error = parse_fetch_options(data)
+    if error:
+        return jsonify({'success': False, 'error': error})
+    pages = data.get('pages', {})
+    try:
+        start_page, page_step = int(pages.get('start', 1)), int(pages.get('step', 1))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'pages.start and pages.step must be integers'}), 400
+    max_pages, error = number_param(data, 'max_pages', PAGINATE_MAX_PAGES, int, 1, PAGINATE_MAX_PAGES)
+    if not error:
+        delay, error = number_param(data, 'delay', JOB_DOMAIN_DELAY, float, 0)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    crawl = PaginatedCrawl(
+        rules,
+        pagination=pagination,
+        url=url,
+        next_selector=data.get('next_selector'),
+        url_template=normalize_url(template) if template else None,
+        start_page=start_page,
+        page_step=page_step,
+        max_pages=max_pages,
+        dedupe=bool(data.get('dedupe', True)),
+        mode=mode,
+        delay=delay,
+        wait_options=wait_options
+    )
+
+    def generate():
+        for line in crawl.run():
+            yield json.dumps(line) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/parallel_extract', methods=['POST'])
+def parallel_extract():
+    """Apply a rule set to many stored pages across CPU cores, streaming NDJSON as pages finish"""
+    data = request.json
+    rules, error = resolve_rules(data, as_dicts=True)
+    if error:
+        return jsonify({'success': False, 'error': error})
+
+    # Sessions with identical content are extracted once
+    sessions_by_hash = OrderedDict()
+    missing = []
+    for session_id in data.get('session_ids', []):
+        digest = scraped_data_store.content_hash(session_id)
+        if digest is None:
+            missing.append({'session_ids': [session_id], 'success': False, 'error': 'Session not found'})
+        else:
+            sessions_by_hash.setdefault(digest, []).append(session_id)
+    for digest in data.get('content_hashes', []):
+        sessions_by_hash.setdefault(digest, [])
+
+    snapshots = []
+    for digest in sessions_by_hash:
+        path = scraped_data_store.snapshot_file(digest)
+        if path is None:
+            missing.append({'content_hash': digest, 'session_ids': sessions_by_hash[digest],
+                            'success': False, 'error': 'Snapshot not found'})
+        else:
+            snapshots.append((digest, path))
+    if not snapshots and not missing:
+        return jsonify({'success': False, 'error': 'Provide session_ids or content_hashes'})
+
+    def generate():
+        for line in missing:
+            yield json.dumps(line) + '\n'
+        if not snapshots:
+            return
+        for digest, results, error in parallel_extractor.run(snapshots, rules):
+            yield json.dumps({
+                'content_hash': digest,
+                'session_ids': sessions_by_hash[digest],
+                'success': error is None,
+                'error': error,
+                'results': results
+            }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Start a background crawl over a URL list or a paged URL template"""
+    data = request.json
+    urls = data.get('urls', [])
+    template = data.get('url_template', '')
+
+    if template:
+        if '{page}' not in template:
+            return jsonify({'success': False, 'error': 'url_template must contain {page}'})
+        pages = data.get('pages', {})
+        try:
+            urls = urls + expand_url_template(template, int(pages.get('start', 1)),
+                                              int(pages.get('end', 1)), int(pages.get('step', 1)))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'pages needs integer start, end and step'}), 400
+
+    if not urls:
+        return jsonify({'success': False, 'error': 'Provide urls or url_template'})
+    if len(urls) > JOB_MAX_URLS:
+        return jsonify({'success': False, 'error': f'A job can crawl at most {JOB_MAX_URLS} URLs'})
+
+    rules, error = resolve_rules(data)
+    if error:
+        return jsonify({'success': False, 'error': error})
+
+    mode, wait_options, error = parse_fetch_options(data)
+    if error:
+        return jsonify({'success': False, 'error': error})
+    concurrency, error = number_param(data, 'concurrency', 4, int, 1, JOB_MAX_CONCURRENCY)
+    if not error:
+        delay, error = number_param(data, 'delay', JOB_DOMAIN_DELAY, float, 0)
+    if not error:
+        retries, error = number_param(data, 'retries', 2, int, 0)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+
+    job = CrawlJob(
+        [normalize_url(url) for url in urls],
+        rules,
+        mode=mode,
+        concurrency=concurrency,
+        delay=delay,
+        retries=retries,
+        store_pages=bool(data.get('store_pages', False)),
+        wait_options=wait_options
+    )
+    start_job(job)
+    return jsonify({'success': True, 'job': job.summary()})
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List crawl jobs"""
+    return jsonify({'success': True, 'jobs': [job.summary() for job in list(jobs_store.values())]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get crawl job progress and a page of its results"""
+    job = jobs_store.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'})
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
     return jsonify({
         'success': True,
-        'results': results
+        'job': job.summary(),
+        'offset': offset,
+        'results': job.results_page(offset, limit)
     })
 
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a crawl job"""
+    job = jobs_store.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'})
+    job.cancel()
+    return jsonify({'success': True, 'job': job.summary()})
+
 if __name__ == '__main__':
     print("=" * 60)
     print("ScrapeBI - No-Code Web Scraping Tool")
@@ -660,7 +4361,16 @@ if __name__ == '__main__':
     print("Press Ctrl+C to stop")
     print("=" * 60)
 
+    # Resolve ChromeDriver now so no scrape pays for it
+    try:
+        driver_launcher.resolve()
+    except Exception as e:
+        print(f"ChromeDriver unavailable, browser mode will fail: {e}")
+
     try:
         app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
     finally:
+        parallel_extractor.close()
+        async_backend.close()
+        driver_pool.close()
         scraper.close()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+ScrapeBI - Benchmarks
+Measure the scrape, extraction and export hot paths on synthetic and recorded pages
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app import (
+    ELEMENT_CATEGORIES, ParallelExtractor, ParsedDocument, extraction_engine, http_fetcher,
+    stream_csv, stream_json, stream_ndjson
+)
+
+# libxml2 stops nesting elements below this depth
+MAX_NESTING = 250
+
+
+def synthetic_page(products=3000):
+    """Build a product listing page with `products` cards"""
+    parts = ['<!DOCTYPE html><html><head><title>Benchmark</title></head><body><div id="content" class="main">']
+    for i in range(products):
+        sale = ' sale' if i % 3 == 0 else ''
+        parts.append(
+            f'<div class="product card{sale}" data-id="{i}" id="product-{i}">'
+            f'<h2 class="title">Product <b>{i}</b></h2>'
+            f'<a href="/products/{i}" class="link">View</a>'
+            f'<span class="price">${i}.99</span>'
+            f'<ul class="features"><li>Feature A{i}</li><li>Feature B{i}</li></ul>'
+            f'<img src="/img/{i}.png" alt="Product {i}"></div>'
+        )
+    parts.append('<p id="footer">End of listing</p></div></body></html>')
+    return ''.join(parts)
+
+
+def sized_page(megabytes):
+    """Product listing of roughly `megabytes` MB"""
+    per_product = len(synthetic_page(100)) / 100
+    return synthetic_page(int(megabytes * 1024 * 1024 / per_product))
+
+
+def nested_page(branches=40, depth=MAX_NESTING - 10):
+    """Page of `branches` div chains nested `depth` levels deep"""
+    chain = ''.join(f'<div class="n level-{level}">' for level in range(depth))
+    leaf = '<span class="leaf">Leaf <a href="/deep">link</a></span>'
+    body = ''.join(chain + leaf + '</div>' * depth for _ in range(branches))
+    return f'<!DOCTYPE html><html><head><title>Nested</title></head><body>{body}</body></html>'
+
+
+def wide_table_page(rows=2000, columns=40):
+    """Data table with `rows` rows of `columns` cells"""
+    header = ''.join(f'<th>Column {c}</th>' for c in range(columns))
+    body = ''.join(
+        f'<tr class="row">' + ''.join(f'<td class="cell c{c}">{r * columns + c}</td>' for c in range(columns)) + '</tr>'
+        for r in range(rows)
+    )
+    return (f'<!DOCTYPE html><html><head><title>Table</title></head><body>'
+            f'<table id="data"><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table></body></html>')
+
+
+# Fixture pages served by the suite; recorded pages can be added with --corpus-dir
+CORPUS = {
+    'small': lambda: synthetic_page(20),
+    '1mb': lambda: sized_page(1),
+    '10mb': lambda: sized_page(10),
+    'nested': nested_page,
+    'wide_table': wide_table_page,
+}
+
+
+def rule_set(count):
+    """Build `count` tag/class/id rules cycling over the synthetic page's structure"""
+    choices = [
+        ('tag', 'li'), ('tag', 'h2'), ('tag', 'a'), ('tag', 'img'), ('tag', 'span'),
+        ('class', 'price'), ('class', 'title'), ('class', 'sale'), ('class', 'link'),
+        ('class', 'features'), ('id', 'footer'), ('id', 'content'),
+    ]
+    rules = []
+    for i in range(count):
+        selector_type, selector = choices[i % len(choices)]
+        rules.append({
+            'name': f'rule_{i}',
+            'selector_type': selector_type,
+            'selector': selector,
+            'attribute': 'text' if i % 2 else 'class'
+        })
+    return rules
+
+
+def suite_rules(count):
+    """Build `count` rules of every selector type, covering all corpus pages"""
+    choices = [
+        ('css', 'div.product h2.title', 'text', None), ('tag', 'td', 'text', None),
+        ('class', 'price', 'text', r'\$(\d+)'), ('xpath', '//a/@href', 'text', None),
+        ('css', 'tr.row > td:nth-child(3)', 'text', None), ('class', 'leaf', 'html', None),
+        ('tag', 'img', 'src', None), ('id', 'footer', 'text', None),
+        ('xpath', '//div[@data-id]', 'data-id', None), ('css', 'div.n > span a', 'href', None),
+    ]
+    rules = []
+    for i in range(count):
+        selector_type, selector, attribute, regex = choices[i % len(choices)]
+        rules.append({'name': f'rule_{i}', 'selector_type': selector_type, 'selector': selector,
+                      'attribute': attribute, 'regex': regex})
+    return rules
+
+
+def best_of(func, repeat):
+    """Best wall-clock time of `repeat` runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def bench_batch_extract(products, rule_counts, repeat):
+    """Compare per-rule extraction with the single-pass batch engine"""
+    tree = ParsedDocument(synthetic_page(products)).tree
+    print(f"Batch extraction on {products} products ({sum(1 for _ in tree.iter())} nodes)")
+    print(f"{'rules':>6} {'per-rule ms':>12} {'single-pass ms':>15} {'speedup':>8}")
+
+    for count in rule_counts:
+        rules = rule_set(count)
+        compiled = [extraction_engine.compile_rule(rule) for rule in rules]
+
+        per_rule = best_of(lambda: [extraction_engine.extract(tree, rule) for rule in compiled], repeat)
+        single_pass = best_of(lambda: extraction_engine.extract_many(tree, compiled), repeat)
+
+        identical = [extraction_engine.extract(tree, rule) for rule in compiled] == \
+            extraction_engine.extract_many(tree, compiled)
+        note = '' if identical else '  (results differ!)'
+        print(f"{count:>6} {per_rule:>12.1f} {single_pass:>15.1f} {per_rule / single_pass:>7.1f}x{note}")
+
+
+def bench_parallel_extract(pages, products, rule_count, worker_counts):
+    """Time process-pool extraction over gzip snapshot files for several worker counts"""
+    rules = rule_set(rule_count)
+    with tempfile.TemporaryDirectory() as directory:
+        snapshots = []
+        for i in range(pages):
+            path = os.path.join(directory, f'{i}.html.gz')
+            with open(path, 'wb') as f:
+                f.write(gzip.compress(synthetic_page(products).replace('Benchmark', f'Page {i}').encode('utf-8')))
+            snapshots.append((str(i), path))
+
+        print(f"\nParallel extraction of {rule_count} rules over {pages} pages ({products} products each)")
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            extractor = ParallelExtractor(workers=workers)
+            # Warm the pool so process start-up is not timed
+            list(extractor.run(snapshots[:workers], rules))
+            started = time.perf_counter()
+            done = sum(1 for _ in extractor.run(snapshots, rules))
+            elapsed = time.perf_counter() - started
+            extractor.close()
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {done / elapsed:>9.1f} {baseline / elapsed:>7.1f}x")
+
+
+class FixtureServer:
+    """Local HTTP server serving corpus pages from memory at /<name>"""
+
+    def __init__(self, pages):
+        bodies = {f'/{name}': html.encode('utf-8') for name, html in pages.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = bodies.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of timings"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def measure(func, samples, size=None, setup=None, budget=None):
+    """Latency percentiles, throughput and peak traced memory of `func`.
+
+    `setup` builds the argument for each call outside the timed region. Sampling stops early,
+    after at least three runs, once the timed runs exceed `budget` seconds. Memory is measured
+    on an extra run under tracemalloc, so tracing does not slow the timed runs; it counts
+    Python allocations only, not the C-level memory libxml2 uses for trees.
+    """
+    setup = setup or (lambda: None)
+    func(setup())
+    timings = []
+    for _ in range(samples):
+        argument = setup()
+        started = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - started)
+        if budget and len(timings) >= 3 and sum(timings) > budget:
+            break
+
+    argument = setup()
+    tracemalloc.start()
+    func(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    mean = sum(timings) / len(timings)
+    result = {
+        'samples': len(timings),
+        'p50_ms': percentile(timings, 0.5) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'max_ms': max(timings) * 1000,
+        'ops_per_s': 1 / mean if mean else 0.0,
+        'peak_mb': peak / 1024 / 1024,
+    }
+    if size:
+        result['mb_per_s'] = size / 1024 / 1024 / mean if mean else 0.0
+    return result
+
+
+def export_records(results):
+    """rule/index/value records for extraction results, as /api/export receives them"""
+    return [{'rule': rule, 'index': index, 'value': value}
+            for rule, values in results.items() for index, value in enumerate(values)]
+
+
+def fetch_http(url):
+    """Fetch a page over plain HTTP, bypassing the response cache"""
+    html, error, _ = http_fetcher.fetch(url, use_cache=False)
+    if error:
+        raise RuntimeError(f'{url}: {error}')
+    return html
+
+
+def fetch_browser(url):
+    """Fetch a page with a pooled browser"""
+    from app import driver_pool
+    with driver_pool.session() as worker:
+        html, error = worker.scrape_url(url, wait_strategy='ready_state')
+    if error:
+        raise RuntimeError(f'{url}: {error}')
+    return html
+
+
+def bench_page(url, rule_counts, samples, browser, budget=None):
+    """Time each stage on one served page; returns (page bytes, {stage: measurement})"""
+    measure_stage = partial(measure, budget=budget)
+    html = fetch_http(url)
+    size = len(html.encode('utf-8'))
+    stages = {'fetch_http': measure_stage(lambda _: fetch_http(url), samples, size)}
+    if browser:
+        stages['fetch_browser'] = measure_stage(lambda _: fetch_browser(url), max(1, samples // 4), size)
+
+    stages['parse'] = measure_stage(lambda _: ParsedDocument(html).tree, samples, size)
+
+    def parsed():
+        document = ParsedDocument(html)
+        document.tree
+        return document
+
+    def elements(document):
+        inventory = document.inventory
+        inventory.counts()
+        for category in ELEMENT_CATEGORIES:
+            inventory.page(category)
+
+    stages['elements'] = measure_stage(elements, samples, size, setup=parsed)
+
+    tree = ParsedDocument(html).tree
+    results = {}
+    for count in rule_counts:
+        rules = [extraction_engine.compile_rule(rule) for rule in suite_rules(count)]
+        stages[f'extract_{count}'] = measure_stage(lambda _: extraction_engine.extract_many(tree, rules), samples, size)
+        results = dict(zip((rule.name for rule in rules), extraction_engine.extract_many(tree, rules)))
+
+    records = export_records(results)
+    exports = {
+        'json': lambda _: ''.join(stream_json(iter(records))),
+        'csv': lambda _: ''.join(stream_csv(iter(records), ['rule', 'index', 'value'])),
+        'ndjson': lambda _: ''.join(stream_ndjson(iter(records))),
+    }
+    for export_format, export in exports.items():
+        stages[f'export_{export_format}'] = measure_stage(export, samples)
+        stages[f'export_{export_format}']['records'] = len(records)
+    return size, stages
+
+
+def load_corpus(names, corpus_dir=None):
+    """Build the selected fixture pages and add recorded *.html pages from corpus_dir"""
+    pages = {name: CORPUS[name]() for name in names}
+    if corpus_dir:
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return pages
+
+
+def run_suite(args):
+    """Serve the corpus locally and time every stage on every page"""
+    pages = load_corpus(args.corpus, args.corpus_dir)
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'samples': args.samples,
+        'rule_sets': args.rule_sets,
+        'results': {},
+    }
+    print(f"{'page':<12} {'stage':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'MB/s':>8} {'peak MB':>8}")
+    with FixtureServer(pages) as base:
+        for name in pages:
+            size, stages = bench_page(f'{base}/{name}', args.rule_sets, args.samples, args.browser, args.budget)
+            for stage, result in stages.items():
+                report['results'][f'{name}/{stage}'] = dict(result, bytes=size)
+                throughput = f"{result['mb_per_s']:>8.1f}" if 'mb_per_s' in result else f"{'-':>8}"
+                print(f"{name:<12} {stage:<14} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['p99_ms']:>9.2f} {result['ops_per_s']:>9.1f} {throughput} {result['peak_mb']:>8.1f}")
+
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        return compare_baseline(report, args.compare, args.threshold)
+    return 0
+
+
+def compare_baseline(report, path, threshold, min_delta_ms=0.5):
+    """Print p50 changes against a saved baseline; returns 1 when any stage regressed.
+
+    Changes smaller than min_delta_ms are treated as noise, whatever their percentage.
+    """
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+
+    print(f"\nComparison with {path} (p50, regression threshold {threshold:.0%})")
+    print(f"{'page/stage':<28} {'base ms':>9} {'now ms':>9} {'change':>8}")
+    regressions = 0
+    for key, result in report['results'].items():
+        if key not in baseline:
+            continue
+        before, now = baseline[key]['p50_ms'], result['p50_ms']
+        change = (now - before) / before if before else 0.0
+        note = ''
+        if change > threshold and now - before >= min_delta_ms:
+            note = '  REGRESSION'
+            regressions += 1
+        elif change < -threshold and before - now >= min_delta_ms:
+            note = '  faster'
+        print(f"{key:<28} {before:>9.2f} {now:>9.2f} {change:>+7.0%}{note}")
+    missing = set(baseline) - set(report['results'])
+    if missing:
+        print(f"{len(missing)} baseline stage(s) not measured this run")
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ScrapeBI benchmarks')
+    parser.add_argument('--products', type=int, default=3000, help='Product cards in the synthetic page')
+    parser.add_argument('--rules', type=int, nargs='+', default=[1, 5, 10, 25, 50], help='Rule counts to test')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    parser.add_argument('--pages', type=int, default=0, help='Also benchmark parallel extraction over this many pages')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Worker counts for --pages')
+    suite = parser.add_argument_group('stage suite')
+    suite.add_argument('--suite', action='store_true', help='Time fetch/parse/elements/extract/export stages '
+                       'on corpus pages served locally, instead of the extraction comparisons')
+    suite.add_argument('--corpus', nargs='+', choices=list(CORPUS), default=list(CORPUS), help='Fixture pages to use')
+    suite.add_argument('--corpus-dir', help='Directory of recorded *.html pages to add to the corpus')
+    suite.add_argument('--rule-sets', type=int, nargs='+', default=[1, 10, 50], help='Rule counts for the extract stage')
+    suite.add_argument('--samples', type=int, default=10, help='Timed runs per stage')
+    suite.add_argument('--budget', type=float, default=10.0, help='Seconds after which a stage stops sampling '
+                       '(at least 3 runs are always made)')
+    suite.add_argument('--browser', action='store_true', help='Also time browser fetches (needs Chrome)')
+    suite.add_argument('--save', help='Write the results to this JSON file as a baseline')
+    suite.add_argument('--compare', help='Compare against a saved baseline; exits with 1 on regressions')
+    suite.add_argument('--threshold', type=float, default=0.15, help='p50 slowdown counted as a regression')
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(run_suite(args))
+
+    bench_batch_extract(args.products, args.rules, args.repeat)
+    if args.pages:
+        bench_parallel_extract(args.pages, args.products // 10, 10, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -29,14 +29,14 @@ def check_dependencies():
     print("📦 Checking dependencies...")
     
     required_packages = [
-        'flask', 'selenium', 'webdriver_manager', 'bs4', 'pandas', 'lxml'
+        'flask', 'selenium', 'webdriver_manager', 'lxml', 'cssselect'
     ]
     
     missing_packages = []
     
     for package in required_packages:
         try:
-            __import__(package.replace('webdriver_manager', 'webdriver_manager.chrome').replace('bs4', 'bs4'))
+            __import__(package.replace('webdriver_manager', 'webdriver_manager.chrome'))
         except ImportError:
             missing_packages.append(package)
     
@@ -93,7 +93,13 @@ def start_server():
     
     try:
         # Import the Flask app
-        from app import app, scraper
+        from app import app, scraper, driver_launcher
+
+        # Resolve ChromeDriver once up front so no scrape pays for it
+        try:
+            driver_launcher.resolve()
+        except Exception as e:
+            print(f"⚠️  ChromeDriver unavailable, browser mode will fail: {e}")
         
         # Open browser after a short delay
         def open_browser():
@@ -126,9 +132,12 @@ def signal_handler(sig, frame):
     print("🧹 Cleaning up resources...")
     
     try:
-        from app import scraper
+        from app import scraper, driver_pool, async_backend, parallel_extractor
+        parallel_extractor.close()
+        async_backend.close()
+        driver_pool.close()
         scraper.close()
-        print("✅ WebDriver closed successfully")
+        print("✅ WebDriver pool closed successfully")
     except:
         pass
     
@@ -16,7 +16,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Listen for messages from iframe
     window.addEventListener('message', function(event) {
-        if (event.data.type === 'element_selected') {
+        const frame = document.getElementById('previewFrame');
+        if (event.source === frame.contentWindow && event.data && event.data.type === 'element_selected') {
             handleElementSelection(event.data);
         }
     });
@@ -25,6 +26,38 @@ document.addEventListener('DOMContentLoaded', function() {
     checkConnectionStatus();
 });
 
+// Bytes of page source shown in the HTML tab
+const HTML_VIEW_BYTES = 256 * 1024;
+
+// Load the first HTML_VIEW_BYTES of the page source into the HTML code view
+async function loadHtmlSource(totalLength) {
+    const htmlCodeEl = document.getElementById('htmlCode');
+    const htmlInfo = document.getElementById('htmlInfo');
+    const htmlStats = document.getElementById('htmlStats');
+
+    try {
+        const response = await fetch(`/api/html/${currentSessionId}`, {
+            headers: { Range: `bytes=0-${HTML_VIEW_BYTES - 1}` }
+        });
+        if (!response.ok) return;
+        const source = await response.text();
+        const partial = response.status === 206;
+        if (!partial) {
+            currentHtml = source;
+        }
+
+        const lines = formatHtml(source).split('\n');
+        const displayHtml = lines.slice(0, 500).join('\n');
+        const more = lines.length > 500 || partial;
+        htmlCodeEl.textContent = displayHtml + (more ? '\n\n... [more lines - use Download to get full HTML]' : '');
+        htmlInfo.classList.remove('hidden');
+        htmlStats.textContent = `Size: ${(totalLength / 1024).toFixed(2)} KB` +
+            (more ? ` • Showing the first ${Math.min(lines.length, 500).toLocaleString()} lines` : ` • Total lines: ${lines.length.toLocaleString()}`);
+    } catch (error) {
+        console.error('Error loading HTML:', error);
+    }
+}
+
 // Format HTML with proper indentation
 function formatHtml(html) {
     if (!html) return '';
@@ -286,7 +319,7 @@ async function scrapeUrl() {
 
         if (data.success) {
             currentSessionId = data.session_id;
-            currentHtml = data.preview;
+            currentHtml = '';
 
             // Update session info
             document.getElementById('sessionInfo').innerHTML = '<span class="badge badge-success"><i class="fas fa-check-circle"></i> Active Session</span>';
@@ -294,28 +327,8 @@ async function scrapeUrl() {
             document.getElementById('pageUrl').textContent = url;
             document.getElementById('pageTitle').textContent = data.title;
 
-            // Update HTML code view with formatted HTML (first 500 lines for preview)
-            const formattedHtml = formatHtml(data.preview);
-            const htmlCodeEl = document.getElementById('htmlCode');
-            const htmlInfo = document.getElementById('htmlInfo');
-            const htmlStats = document.getElementById('htmlStats');
-
-            if (formattedHtml === null) {
-                // HTML too large to format, show raw preview
-                const rawPreview = data.preview.substring(0, 50000);
-                htmlCodeEl.textContent = rawPreview + '\n\n... [HTML too large to display - use Download button to get full file]';
-                htmlInfo.classList.remove('hidden');
-                htmlStats.textContent = `Size: ${(data.preview.length / 1024).toFixed(2)} KB • Too large to display formatted`;
-            } else {
-                const lines = formattedHtml.split('\n');
-                const previewLines = lines.slice(0, 500);
-                const previewHtml = previewLines.join('\n');
-                const displayHtml = previewHtml + (lines.length > 500 ? '\n\n... [' + (lines.length - 500) + ' more lines - use Download to get full HTML]' : '');
-
-                htmlCodeEl.textContent = displayHtml;
-                htmlInfo.classList.remove('hidden');
-                htmlStats.textContent = `Total lines: ${lines.length.toLocaleString()} • Size: ${(formattedHtml.length / 1024).toFixed(2)} KB`;
-            }
+            // Show the start of the page source; the full file is fetched on copy/download
+            await loadHtmlSource(data.html_length);
 
             // Load elements and preview
             await loadElements();
@@ -348,7 +361,90 @@ async function scrapeUrl() {
     }
 }
 
-// Load elements from scraped page
+// Element list categories: accordion header style and card renderer
+const ELEMENT_CATEGORIES = {
+    headings: {
+        label: 'Headings', icon: 'fa-heading', color: 'blue', badge: 'badge-primary',
+        card: h => `
+            <div class="flex-1 min-w-0">
+                <span class="badge badge-primary">${h.tag}</span>
+                <span class="ml-2 text-sm text-gray-700">${h.text || '<em>No text</em>'}</span>
+                <code class="text-xs text-gray-500 ml-2 block mt-1">${h.selector}</code>
+            </div>`
+    },
+    links: {
+        label: 'Links', icon: 'fa-link', color: 'green', badge: 'badge-success',
+        card: l => `
+            <div class="flex-1 min-w-0">
+                <span class="badge badge-success">LINK</span>
+                <span class="ml-2 text-sm text-gray-700">${l.text || '<em>No text</em>'}</span>
+                <code class="text-xs text-gray-500 ml-2 block mt-1 truncate">${l.href}</code>
+            </div>`
+    },
+    images: {
+        label: 'Images', icon: 'fa-image', color: 'purple', badge: 'badge-info',
+        card: img => `
+            <div class="flex-1 min-w-0">
+                <span class="badge badge-info">IMG</span>
+                <span class="ml-2 text-sm text-gray-700">${img.alt || '<em>No alt text</em>'}</span>
+                <code class="text-xs text-gray-500 ml-2 block mt-1 truncate">${img.src}</code>
+            </div>`
+    },
+    paragraphs: {
+        label: 'Paragraphs', icon: 'fa-paragraph', color: 'orange', badge: 'badge-warning',
+        card: p => `
+            <div class="flex-1 min-w-0">
+                <span class="badge badge-warning">P</span>
+                <span class="ml-2 text-sm text-gray-700">${p.text.substring(0, 80)}${p.text.length > 80 ? '...' : ''}</span>
+            </div>`
+    },
+    tables: {
+        label: 'Tables', icon: 'fa-table', color: 'red', badge: 'badge-danger',
+        card: t => `
+            <div class="flex-1">
+                <span class="badge badge-danger">TABLE</span>
+                <span class="ml-2 text-sm text-gray-700">${t.rows} row${t.rows !== 1 ? 's' : ''}</span>
+            </div>`
+    },
+    lists: {
+        label: 'Lists', icon: 'fa-list', color: 'indigo', badge: 'badge-primary',
+        card: l => `
+            <div class="flex-1">
+                <span class="badge badge-primary">${l.tag.toUpperCase()}</span>
+                <span class="ml-2 text-sm text-gray-700">${l.items} item${l.items !== 1 ? 's' : ''}</span>
+            </div>`
+    },
+    forms: {
+        label: 'Forms', icon: 'fa-envelope', color: 'yellow', badge: 'badge-warning',
+        card: f => `
+            <div class="flex-1 min-w-0">
+                <span class="badge badge-warning">FORM</span>
+                <span class="ml-2 text-sm text-gray-700">${f.action || '<em>No action</em>'}</span>
+            </div>`
+    },
+    buttons: {
+        label: 'Buttons', icon: 'fa-square', color: 'cyan', badge: 'badge-info',
+        card: b => `
+            <div class="flex-1">
+                <span class="badge badge-info">BTN</span>
+                <span class="ml-2 text-sm text-gray-700">${b.text || '<em>No text</em>'}</span>
+            </div>`
+    },
+    inputs: {
+        label: 'Inputs', icon: 'fa-edit', color: 'pink', badge: 'badge-secondary',
+        card: i => `
+            <div class="flex-1">
+                <span class="badge badge-secondary">${i.type.toUpperCase()}</span>
+                <span class="ml-2 text-sm text-gray-700">${i.name || i.placeholder || '<em>Unnamed</em>'}</span>
+            </div>`
+    }
+};
+const ELEMENTS_PAGE_SIZE = 100;
+
+// Items loaded so far per category; categories are fetched when their accordion opens
+let loadedElements = {};
+
+// Load element counts from scraped page
 async function loadElements() {
     if (!currentSessionId) return;
 
@@ -356,13 +452,13 @@ async function loadElements() {
         const response = await fetch('/api/get_elements', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ session_id: currentSessionId })
+            body: JSON.stringify({ session_id: currentSessionId, summary: true })
         });
 
         const data = await response.json();
 
         if (data.success) {
-            renderElements(data.elements);
+            renderElements(data.counts);
         }
     } catch (error) {
         console.error('Error loading elements:', error);
@@ -370,14 +466,67 @@ async function loadElements() {
     }
 }
 
-// Render elements with enhanced UI
-function renderElements(elements) {
+// Load the next page of one category into its accordion
+async function loadElementPage(category) {
+    const state = loadedElements[category];
+    if (!state || state.loading || state.offset >= state.total) return;
+    state.loading = true;
+
+    try {
+        const response = await fetch('/api/get_elements', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                session_id: currentSessionId,
+                category: category,
+                offset: state.offset,
+                limit: ELEMENTS_PAGE_SIZE
+            })
+        });
+
+        const data = await response.json();
+        if (!data.success) return;
+
+        const meta = ELEMENT_CATEGORIES[category];
+        const body = document.querySelector(`#accordion-${category} .accordion-body`);
+        body.querySelector('.element-more')?.remove();
+        body.querySelector('.element-loading')?.remove();
+        const first = state.items.length;
+        state.items.push(...data.items);
+        body.insertAdjacentHTML('beforeend', data.items.map((item, i) => `
+            <div class="element-card" onclick="selectElement('${category}', ${first + i})">
+                <div class="flex items-center gap-3">
+                    <div class="w-8 h-8 rounded-lg bg-${meta.color}-100 flex items-center justify-center">
+                        <i class="fas ${meta.icon} text-${meta.color}-600 text-sm"></i>
+                    </div>
+                    ${meta.card(item)}
+                </div>
+            </div>
+        `).join(''));
+
+        state.offset += data.items.length;
+        if (state.offset < data.total) {
+            body.insertAdjacentHTML('beforeend', `
+                <button class="element-more btn-secondary w-full mt-2" onclick="loadElementPage('${category}')">
+                    Load more (${data.total - state.offset} remaining)
+                </button>
+            `);
+        }
+    } catch (error) {
+        console.error('Error loading elements:', error);
+        showToast('Failed to load elements', 'error');
+    } finally {
+        state.loading = false;
+    }
+}
+
+// Render one accordion per non-empty category; items load when it opens
+function renderElements(counts) {
     const container = document.getElementById('elementsContainer');
     let html = '';
-    let totalElements = 0;
+    loadedElements = {};
 
-    // Count total elements
-    Object.values(elements).forEach(arr => totalElements += arr.length);
+    const totalElements = Object.values(counts).reduce((sum, count) => sum + count, 0);
 
     if (totalElements === 0) {
         container.innerHTML = `
@@ -392,215 +541,18 @@ function renderElements(elements) {
         return;
     }
 
-    // Headings
-    if (elements.headings.length > 0) {
-        html += createAccordion('headings', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-heading text-blue-500"></i>
-                <span>Headings</span>
-                <span class="badge badge-primary">${elements.headings.length}</span>
-            </div>
-        `, elements.headings.map(h => `
-            <div class="element-card" onclick="selectElement('headings', ${h.index}, '${h.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-blue-100 flex items-center justify-center">
-                        <i class="fas fa-heading text-blue-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1 min-w-0">
-                        <span class="badge badge-primary">${h.tag}</span>
-                        <span class="ml-2 text-sm text-gray-700">${h.text || '<em>No text</em>'}</span>
-                        <code class="text-xs text-gray-500 ml-2 block mt-1">${h.selector}</code>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Links
-    if (elements.links.length > 0) {
-        html += createAccordion('links', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-link text-green-500"></i>
-                <span>Links</span>
-                <span class="badge badge-success">${elements.links.length}</span>
-            </div>
-        `, elements.links.map(l => `
-            <div class="element-card" onclick="selectElement('links', ${l.index}, '${l.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-green-100 flex items-center justify-center">
-                        <i class="fas fa-link text-green-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1 min-w-0">
-                        <span class="badge badge-success">LINK</span>
-                        <span class="ml-2 text-sm text-gray-700">${l.text || '<em>No text</em>'}</span>
-                        <code class="text-xs text-gray-500 ml-2 block mt-1 truncate">${l.href}</code>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Images
-    if (elements.images.length > 0) {
-        html += createAccordion('images', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-image text-purple-500"></i>
-                <span>Images</span>
-                <span class="badge badge-info">${elements.images.length}</span>
-            </div>
-        `, elements.images.map(img => `
-            <div class="element-card" onclick="selectElement('images', ${img.index}, '${img.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-purple-100 flex items-center justify-center">
-                        <i class="fas fa-image text-purple-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1 min-w-0">
-                        <span class="badge badge-info">IMG</span>
-                        <span class="ml-2 text-sm text-gray-700">${img.alt || '<em>No alt text</em>'}</span>
-                        <code class="text-xs text-gray-500 ml-2 block mt-1 truncate">${img.src}</code>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Paragraphs
-    if (elements.paragraphs.length > 0) {
-        html += createAccordion('paragraphs', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-paragraph text-orange-500"></i>
-                <span>Paragraphs</span>
-                <span class="badge badge-warning">${elements.paragraphs.length}</span>
-            </div>
-        `, elements.paragraphs.map(p => `
-            <div class="element-card" onclick="selectElement('paragraphs', ${p.index}, '${p.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-orange-100 flex items-center justify-center">
-                        <i class="fas fa-paragraph text-orange-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1 min-w-0">
-                        <span class="badge badge-warning">P</span>
-                        <span class="ml-2 text-sm text-gray-700">${p.text.substring(0, 80)}${p.text.length > 80 ? '...' : ''}</span>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Tables
-    if (elements.tables.length > 0) {
-        html += createAccordion('tables', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-table text-red-500"></i>
-                <span>Tables</span>
-                <span class="badge badge-danger">${elements.tables.length}</span>
-            </div>
-        `, elements.tables.map(t => `
-            <div class="element-card" onclick="selectElement('tables', ${t.index}, '${t.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-red-100 flex items-center justify-center">
-                        <i class="fas fa-table text-red-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1">
-                        <span class="badge badge-danger">TABLE</span>
-                        <span class="ml-2 text-sm text-gray-700">${t.rows} row${t.rows !== 1 ? 's' : ''}</span>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Lists
-    if (elements.lists.length > 0) {
-        html += createAccordion('lists', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-list text-indigo-500"></i>
-                <span>Lists</span>
-                <span class="badge badge-primary">${elements.lists.length}</span>
-            </div>
-        `, elements.lists.map(l => `
-            <div class="element-card" onclick="selectElement('lists', ${l.index}, '${l.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-indigo-100 flex items-center justify-center">
-                        <i class="fas fa-list text-indigo-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1">
-                        <span class="badge badge-primary">${l.tag.toUpperCase()}</span>
-                        <span class="ml-2 text-sm text-gray-700">${l.items} item${l.items !== 1 ? 's' : ''}</span>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Forms
-    if (elements.forms.length > 0) {
-        html += createAccordion('forms', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-envelope text-yellow-500"></i>
-                <span>Forms</span>
-                <span class="badge badge-warning">${elements.forms.length}</span>
-            </div>
-        `, elements.forms.map(f => `
-            <div class="element-card" onclick="selectElement('forms', ${f.index}, '${f.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-yellow-100 flex items-center justify-center">
-                        <i class="fas fa-envelope text-yellow-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1 min-w-0">
-                        <span class="badge badge-warning">FORM</span>
-                        <span class="ml-2 text-sm text-gray-700">${f.action || '<em>No action</em>'}</span>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Buttons
-    if (elements.buttons.length > 0) {
-        html += createAccordion('buttons', `
+    Object.entries(ELEMENT_CATEGORIES).forEach(([category, meta]) => {
+        const count = counts[category] || 0;
+        if (count === 0) return;
+        loadedElements[category] = { offset: 0, total: count, loading: false, items: [] };
+        html += createAccordion(category, `
             <div class="flex items-center gap-2">
-                <i class="fas fa-square text-cyan-500"></i>
-                <span>Buttons</span>
-                <span class="badge badge-info">${elements.buttons.length}</span>
+                <i class="fas ${meta.icon} text-${meta.color}-500"></i>
+                <span>${meta.label}</span>
+                <span class="badge ${meta.badge}">${count}</span>
             </div>
-        `, elements.buttons.map(b => `
-            <div class="element-card" onclick="selectElement('buttons', ${b.index}, '${b.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-cyan-100 flex items-center justify-center">
-                        <i class="fas fa-square text-cyan-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1">
-                        <span class="badge badge-info">BTN</span>
-                        <span class="ml-2 text-sm text-gray-700">${b.text || '<em>No text</em>'}</span>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
-
-    // Inputs
-    if (elements.inputs.length > 0) {
-        html += createAccordion('inputs', `
-            <div class="flex items-center gap-2">
-                <i class="fas fa-edit text-pink-500"></i>
-                <span>Inputs</span>
-                <span class="badge badge-secondary">${elements.inputs.length}</span>
-            </div>
-        `, elements.inputs.map(i => `
-            <div class="element-card" onclick="selectElement('inputs', ${i.index}, '${i.selector}')">
-                <div class="flex items-center gap-3">
-                    <div class="w-8 h-8 rounded-lg bg-pink-100 flex items-center justify-center">
-                        <i class="fas fa-edit text-pink-600 text-sm"></i>
-                    </div>
-                    <div class="flex-1">
-                        <span class="badge badge-secondary">${i.type.toUpperCase()}</span>
-                        <span class="ml-2 text-sm text-gray-700">${i.name || i.placeholder || '<em>Unnamed</em>'}</span>
-                    </div>
-                </div>
-            </div>
-        `).join(''));
-    }
+        `, '<div class="element-loading text-center py-4 text-gray-400"><i class="fas fa-spinner fa-spin"></i></div>');
+    });
 
     container.innerHTML = html || '<div class="text-center py-16 text-gray-500">No elements detected</div>';
     
@@ -648,10 +600,26 @@ function toggleAccordion(id) {
     content.classList.toggle('open');
     header.classList.toggle('active');
     icon.style.transform = content.classList.contains('open') ? 'rotate(180deg)' : 'rotate(0deg)';
+
+    // Element categories fetch their first page on first open
+    const elements = loadedElements[id];
+    if (elements && elements.offset === 0 && content.classList.contains('open')) {
+        loadElementPage(id);
+    }
+}
+
+// Escape text for use inside HTML markup and attributes
+function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, char => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[char]);
 }
 
 // Select element from list
-function selectElement(type, index, selector) {
+function selectElement(type, position) {
+    const item = loadedElements[type].items[position];
+    const { index, selector } = item;
+
     // Remove previous selection
     document.querySelectorAll('.element-card').forEach(card => {
         card.classList.remove('selected');
@@ -678,19 +646,26 @@ function selectElement(type, index, selector) {
             </div>
         </div>
         <div class="mt-3 p-3 bg-white rounded-lg">
-            <p class="text-xs text-gray-500 mb-1">CSS Selector</p>
-            <code class="text-sm text-blue-600 break-all">${selector}</code>
+            <p class="text-xs text-gray-500 mb-1">CSS Selector (unique)</p>
+            <code class="text-sm text-blue-600 break-all">${escapeHtml(selector)}</code>
+        </div>
+        <div class="mt-3 p-3 bg-white rounded-lg">
+            <div class="flex items-center justify-between mb-1">
+                <p class="text-xs text-gray-500">Similar Elements (${item.similar_count})</p>
+                <button class="text-xs text-blue-600 hover:underline" onclick="useSimilarSelector()">Use for rule</button>
+            </div>
+            <code class="text-sm text-purple-600 break-all">${escapeHtml(item.similar_selector)}</code>
         </div>
     `;
 
-    selectedElement = { type, index, selector };
+    selectedElement = { type, index, selector, similarSelector: item.similar_selector };
     
     // Scroll to element info
     elementInfo.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
 }
 
 // Handle element selection from visual preview
-function handleElementSelection(data) {
+async function handleElementSelection(data) {
     const elementInfo = document.getElementById('selectedElementInfo');
     const elementDetails = document.getElementById('elementDetails');
     
@@ -699,24 +674,60 @@ function handleElementSelection(data) {
         <div class="grid grid-cols-2 gap-3">
             <div class="p-3 bg-white rounded-lg">
                 <p class="text-xs text-gray-500 mb-1">Tag</p>
-                <p class="font-semibold text-gray-800 uppercase">${data.tag || 'Unknown'}</p>
+                <p class="font-semibold text-gray-800 uppercase">${escapeHtml(data.tag || 'Unknown')}</p>
             </div>
             <div class="p-3 bg-white rounded-lg">
                 <p class="text-xs text-gray-500 mb-1">ID</p>
-                <p class="font-semibold text-gray-800">${data.id || '<em>None</em>'}</p>
+                <p class="font-semibold text-gray-800">${data.id ? escapeHtml(data.id) : '<em>None</em>'}</p>
             </div>
         </div>
         <div class="mt-3 p-3 bg-white rounded-lg">
             <p class="text-xs text-gray-500 mb-1">Class</p>
-            <code class="text-sm text-purple-600">${data.className || '<em>None</em>'}</code>
+            <code class="text-sm text-purple-600">${data.className ? escapeHtml(data.className) : '<em>None</em>'}</code>
         </div>
         <div class="mt-3 p-3 bg-white rounded-lg">
             <p class="text-xs text-gray-500 mb-1">Text Content</p>
-            <p class="text-sm text-gray-700">${data.text || '<em>No text</em>'}</p>
+            <p class="text-sm text-gray-700">${data.text ? escapeHtml(data.text) : '<em>No text</em>'}</p>
         </div>
+        <div id="selectedSelectors"></div>
     `;
 
     selectedElement = data;
+
+    // The preview's data-sbi-id maps to the server's copy of the node, which knows its unique selector
+    if (!Number.isInteger(data.sbi_id)) return;
+    try {
+        const response = await fetch('/api/element_info', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ session_id: currentSessionId, node_id: data.sbi_id })
+        });
+        const result = await response.json();
+        if (!result.success || selectedElement !== data) return;
+
+        const element = result.element;
+        data.selector = element.css_selector;
+        data.similarSelector = element.similar_selector;
+        document.getElementById('selectedSelectors').innerHTML = `
+            <div class="mt-3 p-3 bg-white rounded-lg">
+                <p class="text-xs text-gray-500 mb-1">CSS Selector (unique)</p>
+                <code class="text-sm text-blue-600 break-all">${escapeHtml(element.css_selector)}</code>
+            </div>
+            <div class="mt-3 p-3 bg-white rounded-lg">
+                <div class="flex items-center justify-between mb-1">
+                    <p class="text-xs text-gray-500">Similar Elements (${element.similar_count})</p>
+                    <button class="text-xs text-blue-600 hover:underline" onclick="useSimilarSelector()">Use for rule</button>
+                </div>
+                <code class="text-sm text-purple-600 break-all">${escapeHtml(element.similar_selector)}</code>
+            </div>
+            <div class="mt-3 p-3 bg-white rounded-lg">
+                <p class="text-xs text-gray-500 mb-1">XPath</p>
+                <code class="text-sm text-gray-700 break-all">${escapeHtml(element.xpath)}</code>
+            </div>
+        `;
+    } catch (error) {
+        console.error('Error loading element info:', error);
+    }
 }
 
 // Clear selection
@@ -729,8 +740,14 @@ function clearSelection() {
     selectedElement = null;
 }
 
+// Create a rule matching the selected element and its siblings of the same kind
+function useSimilarSelector() {
+    if (!selectedElement || !selectedElement.similarSelector) return;
+    createRuleFromSelection(selectedElement.similarSelector);
+}
+
 // Create rule from selection
-function createRuleFromSelection() {
+function createRuleFromSelection(selectorOverride) {
     if (!selectedElement) {
         showToast('Please select an element first', 'warning');
         return;
@@ -739,7 +756,9 @@ function createRuleFromSelection() {
     let selector = '';
     let selectorType = 'css';
 
-    if (selectedElement.selector) {
+    if (typeof selectorOverride === 'string') {
+        selector = selectorOverride;
+    } else if (selectedElement.selector) {
         selector = selectedElement.selector;
     } else if (selectedElement.id) {
         selector = `#${selectedElement.id}`;
@@ -757,29 +776,14 @@ function createRuleFromSelection() {
     showAddRuleModal();
 }
 
-// Load preview in iframe
-async function loadPreview() {
+// Load preview in iframe; the server builds the sanitized document once per session
+function loadPreview() {
     if (!currentSessionId) return;
 
-    try {
-        const response = await fetch('/api/preview_html', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ session_id: currentSessionId })
-        });
-
-        const data = await response.json();
-
-        if (data.success) {
-            document.getElementById('noPreview').classList.add('hidden');
-            const frame = document.getElementById('previewFrame');
-            frame.classList.remove('hidden');
-            frame.srcdoc = data.html;
-        }
-    } catch (error) {
-        console.error('Error loading preview:', error);
-        showToast('Failed to load preview', 'error');
-    }
+    document.getElementById('noPreview').classList.add('hidden');
+    const frame = document.getElementById('previewFrame');
+    frame.classList.remove('hidden');
+    frame.src = `/api/preview/${currentSessionId}`;
 }
 
 // Refresh preview
@@ -1233,15 +1237,25 @@ async function quickExtract(type) {
     }
 }
 
+// Fetch the full page source once per session
+async function fetchFullHtml() {
+    if (!currentHtml) {
+        const response = await fetch(`/api/html/${currentSessionId}`);
+        if (response.ok) {
+            currentHtml = await response.text();
+        }
+    }
+    return currentHtml;
+}
+
 // Copy HTML to clipboard
-function copyHtml() {
+async function copyHtml() {
     if (!currentSessionId) {
         showToast('No HTML to copy', 'warning');
         return;
     }
     
-    // Get full HTML from currentHtml or fetch it
-    const html = currentHtml;
+    const html = await fetchFullHtml();
     
     if (!html) {
         showToast('No HTML available', 'warning');
@@ -1256,34 +1270,18 @@ function copyHtml() {
 }
 
 // Download HTML file
-async function downloadHtml() {
+function downloadHtml() {
     if (!currentSessionId) {
         showToast('No page to download', 'warning');
         return;
     }
     
-    try {
-        const response = await fetch('/api/download_html', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ session_id: currentSessionId })
-        });
-
-        if (response.ok) {
-            const blob = await response.blob();
-            const url = URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = `scraped_page_${new Date().getTime()}.html`;
-            a.click();
-            URL.revokeObjectURL(url);
-            showToast('Full HTML downloaded!', 'success');
-        } else {
-            showToast('Failed to download', 'error');
-        }
-    } catch (error) {
-        showToast('Error downloading: ' + error.message, 'error');
-    }
+    // The browser downloads straight from the compressed source endpoint
+    const a = document.createElement('a');
+    a.href = `/api/html/${currentSessionId}?download=1`;
+    a.download = `scraped_page_${new Date().getTime()}.html`;
+    a.click();
+    showToast('Full HTML downloaded!', 'success');
 }
 
 // Export results to file